@@ -0,0 +1,308 @@
+"""Computer player: A* to the nearest food over the simulation's grid.
+
+Autopilot is a controller in the tournament.py sense, called as
+autopilot(sim, snake) once per tick. It keeps its route between ticks:
+cells are dropped as the head reaches them, a route that runs into a
+newly occupied cell is cut there and only the rest is searched again,
+and a target that moved a cell (hard mode bugs) just gets the route
+extended or trimmed. All planning runs against a Budget shared by all
+autopilots in the process, per frame when the game loop marks frames
+and per tick otherwise. A search that runs out of time is carried over,
+and once the budget is spent the snakes only follow the routes they
+already have.
+"""
+import time
+import heapq
+
+import engine
+
+
+class Budget(object):
+    """Planning time in ms for all autopilots together and for any single
+    one of them. The total is per tick until begin_frame() is called, then
+    per frame however many ticks the frame runs."""
+
+    def __init__(self, ms=4.0, per_snake=1.0):
+        self.ms = ms
+        self.per_snake = per_snake
+        self.tick = None
+        self.end = 0
+        self.framed = False
+
+    def begin_frame(self):
+        self.framed = True
+        self.end = time.perf_counter() + self.ms / 1000.0
+
+    def deadline(self, sim):
+        now = time.perf_counter()
+        tick = (id(sim), sim.time)
+        if not self.framed and tick != self.tick:
+            self.tick = tick
+            self.end = now + self.ms / 1000.0
+        return min(self.end, now + self.per_snake / 1000.0)
+
+
+#shared by autopilots that are not given their own
+BUDGET = Budget()
+
+
+class Search(object):
+    """A resumable A* from start to goal over free grid cells."""
+
+    def __init__(self, grid, start, goal, blocked):
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.blocked = blocked
+        self.came = {start: -1}
+        self.cost = {start: 0}
+        self.open = [(self.distance(start), 0, start)]
+
+    def distance(self, i):
+        cols = self.grid.cols
+        return abs(i % cols - self.goal % cols) + \
+            abs(i // cols - self.goal // cols)
+
+    def run(self, deadline):
+        """The path as a list of cells, goal first and start left out;
+        [] if the goal can't be reached, None if time ran out first."""
+        grid = self.grid
+        cols, rows = grid.cols, grid.rows
+        cells = grid.cells
+        came = self.came
+        cost = self.cost
+        open_ = self.open
+        blocked = self.blocked
+        goal = self.goal
+        expanded = 0
+        while open_:
+            if not expanded & 15 and time.perf_counter() > deadline:
+                return None
+            expanded += 1
+            f, g, i = heapq.heappop(open_)
+            if i == goal:
+                path = []
+                while i != self.start:
+                    path.append(i)
+                    i = came[i]
+                return path
+            if g > cost[i]:
+                continue
+            col = i % cols
+            g += 1
+            for j, ok in ((i - cols, i >= cols), (i + cols, i + cols < cols * rows),
+                          (i - 1, col > 0), (i + 1, col < cols - 1)):
+                if not ok or (cells[j] and j not in blocked.free) or \
+                        j in blocked.extra:
+                    continue
+                if g < cost.get(j, g + 1):
+                    cost[j] = g
+                    came[j] = i
+                    heapq.heappush(open_, (g + self.distance(j), g, j))
+        return []
+
+
+class Blocked(object):
+    """Exceptions to the grid: occupied cells that will be free (free)
+    and free cells that must be avoided (extra)."""
+
+    def __init__(self, free=(), extra=()):
+        self.free = set(free)
+        self.extra = set(extra)
+
+
+class Autopilot(object):
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.game = None
+        self.forget()
+
+    def forget(self):
+        self.path = []     # cells to visit, next one last
+        self.target = None
+        self.food = None
+        self.search = None
+        self.prefix = []   # kept part of a route being repaired
+
+    def __call__(self, sim, snake):
+        if not snake.body or snake.needs_to_move:
+            # a turn is still waiting for its move; plan once it is made
+            return None
+        # a new game, or a controller reused across matches
+        if self.game is None or self.game[0] != id(sim) or \
+                self.game[1] > sim.time:
+            self.forget()
+        self.game = (id(sim), sim.time)
+        grid = sim.grid
+        head = grid.index(snake.x, snake.y)
+        if head == -1:
+            return None
+        deadline = (self.budget or BUDGET).deadline(sim)
+        if time.perf_counter() >= deadline:
+            return self.coast(snake, grid, head)
+        blocked = self.exceptions(snake, grid)
+
+        self.follow(grid, head)
+        self.retarget(sim, grid, head)
+        if self.target is None:
+            return self.escape(sim, snake, grid, head, blocked)
+        if time.perf_counter() >= deadline:
+            return self.coast(snake, grid, head)
+        self.repair(grid, head, blocked)
+
+        if not self.path:
+            if self.search is None or self.search.start != self.start_of(head) \
+                    or self.search.goal != self.target:
+                self.prefix = []
+                self.search = Search(grid, head, self.target, blocked)
+            found = self.search.run(deadline)
+            if found is None:
+                # out of time: keep to the part of the route still good
+                if self.prefix and not grid.cells[self.prefix[-1]]:
+                    return self.steer(snake, grid, head, self.prefix[-1])
+                return None
+            if not found:
+                # no way through for now; the spent search stays so this
+                # isn't retried until the head has moved
+                return self.escape(sim, snake, grid, head, blocked)
+            self.search = None
+            self.path = found + self.prefix
+            self.prefix = []
+        return self.steer(snake, grid, head, self.path[-1])
+
+    def coast(self, snake, grid, head):
+        """No time left to plan: the next cell of the route so far if it
+        is still free, else keep going."""
+        self.follow(grid, head)
+        for route in (self.path, self.prefix):
+            if route and not grid.cells[route[-1]]:
+                return self.steer(snake, grid, head, route[-1])
+        return None
+
+    def start_of(self, head):
+        return self.prefix[0] if self.prefix else head
+
+    def exceptions(self, snake, grid):
+        # our own tail moves out of the way unless we are growing
+        if snake.length and len(snake.body) >= snake.length:
+            tail = snake.body[len(snake.body) - 1]
+            return Blocked(free=[grid.index(tail[0], tail[1])])
+        return Blocked()
+
+    def adjacent(self, grid, a, b):
+        cols = grid.cols
+        return abs(a % cols - b % cols) + abs(a // cols - b // cols) == 1
+
+    def follow(self, grid, head):
+        """Drop the cells the head has reached; forget a route that no
+        longer starts next to the head (after a crash, say)."""
+        while self.path and self.path[-1] == head:
+            self.path.pop()
+        if self.path and not self.adjacent(grid, head, self.path[-1]):
+            self.path = []
+        while self.prefix and self.prefix[-1] == head:
+            self.prefix.pop()
+        if self.prefix and not self.adjacent(grid, head, self.prefix[-1]):
+            self.prefix = []
+            self.search = None
+
+    def retarget(self, sim, grid, head):
+        """Aim at the food nearest the head, sticking with the one already
+        chosen until it is eaten; follow it if it moves."""
+        half = sim.bulk // 2
+        food = self.food
+        if food is None or food.eaten:
+            cols = grid.cols
+            col, row = head % cols, head // cols
+            food = None
+            best = None
+            for f in sim.food:
+                distance = abs((f.x + half) // sim.bulk - col) + \
+                    abs((f.y + half) // sim.bulk - row)
+                if best is None or distance < best:
+                    food, best = f, distance
+            self.food = food
+        target = None
+        if food is not None:
+            target = grid.index(food.x + half, food.y + half)
+            if target == -1:
+                target = self.food = None
+        if target == self.target:
+            return
+        path = self.path
+        if path and target is not None:
+            if target in path:
+                # the food came towards us along the route
+                del path[:path.index(target)]
+            elif self.adjacent(grid, path[0], target) and not grid.cells[target]:
+                path.insert(0, target)
+            else:
+                self.path = []
+        else:
+            self.path = []
+        self.target = target
+        self.search = None
+
+    def repair(self, grid, head, blocked):
+        """Cut the route at the first cell taken since it was planned and
+        search again only from there."""
+        path = self.path
+        cells = grid.cells
+        for k in range(len(path) - 1, -1, -1):
+            cell = path[k]
+            if cells[cell] and cell not in blocked.free:
+                break
+        else:
+            return
+        kept = path[k + 1:]
+        self.path = []
+        start = kept[0] if kept else head
+        self.prefix = kept
+        self.search = Search(grid, start, self.target,
+                             Blocked(blocked.free, kept + [head]))
+
+    def steer(self, snake, grid, head, cell):
+        cols = grid.cols
+        dx = cell % cols - head % cols
+        dy = cell // cols - head // cols
+        for direction, (ddx, ddy) in engine.DIRECTIONS.items():
+            if (ddx, ddy) == (dx, dy):
+                return direction
+        return None
+
+    def escape(self, sim, snake, grid, head, blocked):
+        """Best safe step while there is no route: the free neighbour
+        with the most free neighbours of its own, then the one closest to
+        the target."""
+        best = None
+        best_score = None
+        for direction, (dx, dy) in engine.DIRECTIONS.items():
+            dx *= snake.bulk
+            dy *= snake.bulk
+            if (dx and dx == -snake.dir_x) or (dy and dy == -snake.dir_y):
+                continue
+            x, y = snake.x + dx, snake.y + dy
+            cell = grid.index(x, y)
+            if not sim.contains(x, y, snake.bulk) or \
+                    (grid.cells[cell] and cell not in blocked.free):
+                continue
+            room = 0
+            for nx, ny in ((x + snake.bulk, y), (x - snake.bulk, y),
+                           (x, y + snake.bulk), (x, y - snake.bulk)):
+                if sim.contains(nx, ny, snake.bulk) and not grid.count(nx, ny):
+                    room += 1
+            score = (room, -self.distance(grid, cell))
+            if best_score is None or score > best_score:
+                best, best_score = direction, score
+        if best is None:
+            return None
+        return self.steer(snake, grid, head, grid.index(
+            snake.x + engine.DIRECTIONS[best][0] * snake.bulk,
+            snake.y + engine.DIRECTIONS[best][1] * snake.bulk))
+
+    def distance(self, grid, cell):
+        if self.target is None:
+            return 0
+        cols = grid.cols
+        return abs(cell % cols - self.target % cols) + \
+            abs(cell // cols - self.target // cols)
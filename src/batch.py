@@ -0,0 +1,248 @@
+"""Many independent snake boards stepped at once with NumPy.
+
+Each board holds one snake and its food and follows the engine rules
+(movement, wall and body crashes, eating, growth by nutritional value,
+speed-up on eat), but every board lives in a row of a few NumPy arrays
+so a single step() advances all of them together. Meant for bot training
+and balancing runs; the interactive game keeps using engine.Simulation.
+"""
+import numpy as np
+
+import engine
+
+
+#action codes accepted by BatchSimulation.step
+ACTIONS = [engine.UP, engine.DOWN, engine.LEFT, engine.RIGHT]
+NOOP = -1
+
+#observation cell values
+EMPTY = 0
+BODY = 1
+HEAD = 2
+FOOD = 3
+
+_DX = np.array([engine.DIRECTIONS[d][0] for d in ACTIONS], dtype=np.int32)
+_DY = np.array([engine.DIRECTIONS[d][1] for d in ACTIONS], dtype=np.int32)
+_REVERSE = np.array([ACTIONS.index(d) for d in
+                     [engine.DOWN, engine.UP, engine.RIGHT, engine.LEFT]])
+
+
+class BatchSimulation(object):
+    """num_boards single-snake games with a gym-like reset/step API.
+
+    Positions are kept in bulk-sized cells; food keeps its pixel position
+    like engine.Food. Crashes are checked after every cell moved, so a
+    long tick cannot carry a snake through a wall. Boards whose snake runs
+    out of lives are reset automatically by step() when autoreset is set.
+    """
+
+    def __init__(self, num_boards, width=800, height=575, bulk=20,
+                 maxfood=1, difficulty=engine.NORMAL, initlength=10,
+                 tick=1000.0 / 60, seed=None, autoreset=True):
+        self.num_boards = num_boards
+        self.width = width
+        self.height = height
+        self.bulk = bulk
+        self.cols = width // bulk
+        self.rows = height // bulk
+        self.maxfood = maxfood
+        self.difficulty = difficulty
+        self.initlength = initlength
+        self.tick = tick
+        self.autoreset = autoreset
+        self.random = np.random.default_rng(seed)
+        # same start cell as player 1 in snakegame.MainApp.run
+        self.start_col = width // 2 // bulk
+        self.start_row = height // 2 // bulk
+
+        n = num_boards
+        self.capacity = self.cols * self.rows + 1
+        self.body = np.zeros((n, self.capacity), dtype=np.int32)
+        self.head_ptr = np.zeros(n, dtype=np.int32)
+        self.size = np.zeros(n, dtype=np.int32)
+        self.grid = np.zeros((n, self.cols * self.rows), dtype=np.uint8)
+        self.col = np.zeros(n, dtype=np.int32)
+        self.row = np.zeros(n, dtype=np.int32)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.length = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lives = np.zeros(n, dtype=np.int32)
+        self.speed = np.zeros(n, dtype=np.float64)
+        self.elapsed = np.zeros(n, dtype=np.float64)
+        self.needs_to_move = np.zeros(n, dtype=bool)
+        # engine.Snake.queued, oldest first
+        self.queued = np.full((n, engine.TURN_QUEUE), NOOP, dtype=np.int8)
+        self.nqueued = np.zeros(n, dtype=np.int32)
+        self.playing = np.zeros(n, dtype=bool)
+        self.food_x = np.zeros((n, maxfood), dtype=np.int32)
+        self.food_y = np.zeros((n, maxfood), dtype=np.int32)
+        self.food_points = np.zeros((n, maxfood), dtype=np.int32)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Start fresh games on the boards selected by mask (all by
+        default) and return the observation."""
+        if mask is None:
+            mask = np.ones(self.num_boards, dtype=bool)
+        idx = np.flatnonzero(mask)
+        self.length[idx] = self.initlength
+        self.score[idx] = 0
+        self.lives[idx] = 3
+        self.speed[idx] = 50 if self.difficulty == engine.HARD else 160
+        self.elapsed[idx] = 0
+        self.playing[idx] = True
+        self.restart(idx)
+        self.spawn_food(np.ones((len(idx), self.maxfood), dtype=bool), idx)
+        return self.observe()
+
+    def restart(self, idx):
+        # engine.Snake.reset: back to the start cell, keep length and score
+        self.grid[idx] = 0
+        self.size[idx] = 0
+        self.head_ptr[idx] = 0
+        self.col[idx] = self.start_col
+        self.row[idx] = self.start_row
+        self.direction[idx] = ACTIONS.index(engine.UP)
+        self.needs_to_move[idx] = False
+        self.nqueued[idx] = 0
+
+    def spawn_food(self, eaten, idx=None):
+        if idx is None:
+            idx = np.arange(self.num_boards)
+        rows, slots = np.nonzero(eaten)
+        rows = idx[rows]
+        count = len(rows)
+        if not count:
+            return
+        # a random cell free of the snake, like engine.Grid.random_free;
+        # on a full board the food goes off the arena, out of reach
+        free = self.grid[rows] == 0
+        cell = (self.random.random(free.shape) * free).argmax(axis=1)
+        x = cell % self.cols * self.bulk
+        y = cell // self.cols * self.bulk
+        full = ~free.any(axis=1)
+        x[full] = y[full] = -2 * self.bulk
+        self.food_x[rows, slots] = x
+        self.food_y[rows, slots] = y
+        # engine.Simulation.food_points
+        x_cartesian = np.abs((x - self.width // 2) // 10)
+        y_cartesian = np.abs((y - self.height // 2) // 10)
+        self.food_points[rows, slots] = (x_cartesian + y_cartesian) // 2
+
+    def turn(self, actions):
+        # engine.Snake.turn: judged against the last queued direction
+        actions = np.asarray(actions)
+        boards = np.arange(self.num_boards)
+        last = np.where(self.nqueued > 0,
+                        self.queued[boards, np.maximum(self.nqueued - 1, 0)],
+                        self.direction)
+        ok = (actions >= 0) & self.playing & (actions != last)
+        ok[ok] &= _REVERSE[actions[ok]] != last[ok]
+        now = ok & ~self.needs_to_move
+        self.direction[now] = actions[now]
+        later = ok & self.needs_to_move & (self.nqueued < engine.TURN_QUEUE)
+        self.queued[later, self.nqueued[later]] = actions[later]
+        self.nqueued[later] += 1
+        self.needs_to_move |= now
+
+    def next_turn(self, idx):
+        # engine.Snake.next_turn, for boards idx that just moved
+        self.needs_to_move[idx] = False
+        idx = idx[self.nqueued[idx] > 0]
+        self.direction[idx] = self.queued[idx, 0]
+        self.queued[idx, :-1] = self.queued[idx, 1:]
+        self.nqueued[idx] -= 1
+        self.needs_to_move[idx] = True
+
+    def eat(self):
+        bulk = self.bulk
+        head_x = (self.col * bulk)[:, None]
+        head_y = (self.row * bulk)[:, None]
+        eaten = (np.abs(self.food_x - head_x) < bulk) & \
+            (np.abs(self.food_y - head_y) < bulk)
+        eaten &= ((self.size > 0) & self.playing)[:, None]
+        self.score += (self.food_points * eaten).sum(axis=1)
+        self.speed -= 0.1 * eaten.sum(axis=1)
+        self.length += (self.food_points // 10 * eaten).sum(axis=1)
+        return eaten
+
+    def move(self, idx):
+        """Advance the snakes on boards idx by one cell, return the mask
+        of those that crashed."""
+        col = self.col[idx] + _DX[self.direction[idx]]
+        row = self.row[idx] + _DY[self.direction[idx]]
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        crashed = ~inside
+        idx = idx[inside]
+        col, row = col[inside], row[inside]
+        self.col[idx] = col
+        self.row[idx] = row
+
+        cell = row * self.cols + col
+        head = (self.head_ptr[idx] + 1) % self.capacity
+        self.head_ptr[idx] = head
+        self.body[idx, head] = cell
+        self.grid[idx, cell] += 1
+        self.size[idx] += 1
+
+        pop = (self.length[idx] != 0) & (self.size[idx] > self.length[idx])
+        popped = idx[pop]
+        tail = (self.head_ptr[popped] - self.size[popped] + 1) % self.capacity
+        self.grid[popped, self.body[popped, tail]] -= 1
+        self.size[popped] -= 1
+
+        crashed[inside] = self.grid[idx, cell] > 1
+        return crashed
+
+    def step(self, actions=None, dt=None):
+        """Advance every board by one tick.
+
+        actions is an int array of ACTIONS indices (NOOP to keep going).
+        Returns (observation, reward, done, info) where reward is the score
+        gained this tick and done marks boards that ran out of lives.
+        """
+        if dt is None:
+            dt = self.tick
+        if actions is not None:
+            self.turn(actions)
+        start_score = self.score.copy()
+
+        eaten = self.eat()
+
+        self.elapsed[self.playing] += dt
+        moving = self.playing & (self.elapsed > self.speed)
+        cycles = np.zeros(self.num_boards, dtype=np.int32)
+        cycles[moving] = (self.elapsed[moving] / self.speed[moving]).astype(np.int32)
+        self.elapsed[moving] -= cycles[moving] * self.speed[moving]
+        crashed = np.zeros(self.num_boards, dtype=bool)
+        for cycle in range(cycles.max(initial=0)):
+            idx = np.flatnonzero((cycles > cycle) & ~crashed)
+            crashed[idx] = self.move(idx)
+            self.next_turn(idx)
+
+        # engine.Snake.handle_crash
+        self.lives[crashed] -= 1
+        self.restart(np.flatnonzero(crashed & (self.lives > 0)))
+        done = crashed & (self.lives <= 0)
+        self.playing[done] = False
+
+        self.spawn_food(eaten)
+        reward = self.score - start_score
+        info = {'score': self.score.copy()}
+        if self.autoreset and done.any():
+            return self.reset(done), reward, done, info
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        """(num_boards, rows, cols) int8 boards of EMPTY, BODY, HEAD and
+        FOOD cells."""
+        n = self.num_boards
+        obs = np.minimum(self.grid, BODY).astype(np.int8)
+        boards = np.arange(n)
+        has_body = self.size > 0
+        obs[boards[has_body],
+            self.body[has_body, self.head_ptr[has_body]]] = HEAD
+        food_col = np.clip(self.food_x // self.bulk, 0, self.cols - 1)
+        food_row = np.clip(self.food_y // self.bulk, 0, self.rows - 1)
+        obs[boards[:, None], food_row * self.cols + food_col] = FOOD
+        return obs.reshape(n, self.rows, self.cols)
@@ -0,0 +1,346 @@
+"""Timings for the move/crash/draw/food hot paths and a full game frame,
+and the memory taken by boards with long snakes and many bugs.
+
+Runs under SDL's dummy video driver and sweeps snake length, player
+count and maxfood. Results go to a JSON file so two commits can be
+compared:
+
+    python benchmark.py [--quick] [--output FILE]
+    python benchmark.py --compare OLD.json NEW.json
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import sys
+import json
+import time
+import tracemalloc
+import platform
+import subprocess
+
+import pygame
+
+import engine
+import autopilot
+import snakegame
+
+
+LENGTHS = [10, 100, 1000, 10000]
+PLAYERS = [1, 2]
+MAXFOOD = [1, 10, 100, 1000]
+FRAME_LENGTHS = [10, 100, 300]
+
+BOTS = [1, 12, 48]
+SWARMS = [1000, 10000] #hard mode bugs, food_move only
+#(players, length, maxfood) boards for bench_memory
+BOARDS = [(1, 10, 0), (1, 10, 1000), (2, 10000, 0), (2, 10000, 100000)]
+
+QUICK_LENGTHS = [10, 1000]
+QUICK_MAXFOOD = [1, 100]
+QUICK_BOTS = [12]
+
+
+def timeit(func, number, repeat=3):
+    """Best time per call in microseconds over repeat runs of number calls."""
+    best = None
+    for i in range(repeat):
+        started = time.perf_counter()
+        for j in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / number * 1e6
+
+
+def calls_for(length):
+    return max(20, min(2000, 200000 // length))
+
+
+def lay_out(snake, cells):
+    """Give snake a body along cells, tail first, heading up."""
+    bulk = snake.bulk
+    for col, row in cells:
+        snake.push_head(col * bulk, row * bulk)
+    snake.x, snake.y = snake.body[0]
+    snake.length = len(cells)
+
+
+def serpentine(length, col0, cols, bottom_row):
+    """Cells of a snake winding up from bottom_row in cols columns."""
+    cells = []
+    row = bottom_row
+    while len(cells) < length:
+        line = [(col0 + c, row) for c in range(cols)]
+        if (bottom_row - row) % 2:
+            line.reverse()
+        cells.extend(line[:length - len(cells)])
+        row -= 1
+    return cells
+
+
+def straight_snake(length, moves, bulk=20):
+    """A snake lying along a one row arena with room for moves steps."""
+    sim = engine.Simulation((length + moves + 2) * bulk, bulk, bulk)
+    snake = engine.Snake(1, (0, 0), length, bulk)
+    lay_out(snake, [(col, 0) for col in range(length)])
+    snake.dir_x, snake.dir_y = bulk, 0
+    sim.add_snake(snake)
+    return sim, snake
+
+
+def bench_move(length):
+    number = calls_for(length)
+    sim, snake = straight_snake(length, number * 3)
+    dt = snake.speed + 1
+    return timeit(lambda: snake.update(dt, sim), number)
+
+
+def bench_check_crash(length):
+    sim, snake = straight_snake(length, 0)
+    return timeit(lambda: snake.check_crash(sim), 5000)
+
+
+def bench_draw(length, bulk=20):
+    cols = snakegame.MainApp.width // bulk
+    rows = length // cols + 2
+    surface = pygame.Surface((cols * bulk, rows * bulk))
+    snake = snakegame.Player('bench', (None, None, None, None), 1, surface,
+                             (0, 0), snakegame.WHITE, length)
+    lay_out(snake, serpentine(length, 0, cols, rows - 1))
+    return timeit(snake.draw, calls_for(length))
+
+
+def arena_sim(players, length, maxfood, difficulty=engine.NORMAL):
+    app = snakegame.MainApp
+    bulk = app.bulk
+    sim = engine.Simulation(app.gamewidth, app.gameheight, bulk, maxfood,
+                            difficulty, seed=1)
+    cols = app.gamewidth // bulk // players
+    bottom = app.gameheight // bulk - 1
+    for number in range(1, players + 1):
+        snake = engine.Snake(number, (0, 0), length, bulk)
+        lay_out(snake, serpentine(length, (number - 1) * cols, cols, bottom))
+        sim.add_snake(snake)
+    sim.set_difficulty(difficulty)
+    sim.clean_food()
+    return sim
+
+
+def bench_food_move(players, length, maxfood):
+    sim = arena_sim(players, length, maxfood, engine.HARD)
+    return timeit(sim.move_food, max(10, 20000 // maxfood))
+
+
+def bench_memory(players, length, maxfood, bulk=20):
+    """Bytes allocated for a hard mode board of Players length long and
+    maxfood bugs, on a square arena just big enough for the snakes."""
+    cols = max(4, int((2 * players * length) ** 0.5) + 2)
+    surface = pygame.Surface((bulk, bulk))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sim = engine.Simulation(cols * bulk, cols * bulk, bulk, maxfood,
+                            engine.HARD, seed=1)
+    width = cols // players
+    for number in range(1, players + 1):
+        snake = snakegame.Player('bench', (None, None, None, None), number,
+                                 surface, (0, 0), snakegame.WHITE, length,
+                                 bulk)
+        lay_out(snake, serpentine(length, (number - 1) * width, width,
+                                  cols - 1))
+        sim.add_snake(snake)
+    sim.set_difficulty(engine.HARD)
+    sim.clean_food()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used
+
+
+def bench_clean_food(maxfood):
+    sim = arena_sim(1, 10, maxfood)
+    return timeit(sim.clean_food, max(10, 20000 // maxfood))
+
+
+def bench_frame(players, length, maxfood, dirty_rects=False):
+    """One Game scene frame (events, render, step) minus the clock wait."""
+    game = snakegame.MainApp()
+    colors = [snakegame.WHITE, snakegame.RED]
+    game.players = []
+    game.maxfood = maxfood
+    game.difficulty = engine.NORMAL
+    cols = game.gamewidth // game.bulk // players
+    bottom = game.gameheight // game.bulk - 1
+    for number in range(1, players + 1):
+        player = snakegame.Player('bench', (None, None, None, None), number,
+                                  game.screen, (0, 0), colors[number - 1],
+                                  length)
+        lay_out(player, serpentine(length, (number - 1) * cols, cols, bottom))
+        game.add_player(player)
+    game.new_simulation()
+    game.dirty_rects = dirty_rects
+    scene = snakegame.Game(game)
+    game.switch(scene)
+
+    def frame():
+        scene.handle_events(pygame.event.get())
+        game.render()
+        game.sim.step()
+    # enough ticks for a few moves, but not enough to reach the top wall
+    return timeit(frame, 30)
+
+
+def bench_autopilot(bots, ticks=1000):
+    """Planning time per tick for bots autopilots on a 1600x1200 arena,
+    as (mean, p99, CPU time p99) in microseconds. The CPU time leaves out
+    time the process was not scheduled, which swamps wall clock p99s on
+    busy or single CPU machines."""
+    sim = engine.Simulation(1600, 1200, maxfood=40, seed=1)
+    pilots = []
+    for number in range(bots):
+        sim.add_snake(engine.Snake(number % 2 + 1,
+                                   sim.grid.random_free(sim.random)))
+        pilots.append(autopilot.Autopilot())
+    times = []
+    cpu_times = []
+    for tick in range(ticks):
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        actions = [pilot(sim, snake) if snake.playing else None
+                   for pilot, snake in zip(pilots, sim.snakes)]
+        times.append(time.perf_counter() - started)
+        cpu_times.append(time.thread_time() - cpu_started)
+        sim.step(actions)
+    times.sort()
+    cpu_times.sort()
+    p99 = len(times) * 99 // 100
+    return (sum(times) / len(times) * 1e6, times[p99] * 1e6,
+            cpu_times[p99] * 1e6)
+
+
+STARTUP = """
+import time
+started = time.perf_counter()
+import snakegame
+snakegame.MainApp().draw_menu()
+print((time.perf_counter() - started) * 1e6)
+"""
+
+
+def bench_startup(repeat=3):
+    """Import to first menu frame in a fresh interpreter, best of repeat."""
+    best = None
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', STARTUP])
+        usec = float(out.decode().split()[-1])
+        if best is None or usec < best:
+            best = usec
+    return best
+
+
+def run(quick=False):
+    lengths = QUICK_LENGTHS if quick else LENGTHS
+    maxfoods = QUICK_MAXFOOD if quick else MAXFOOD
+    pygame.init()
+    results = []
+
+    def record(name, params, value, unit='usec'):
+        results.append({'name': name, 'params': params, unit: value})
+        print('%-12s %-40s %12.2f %s' % (name, json.dumps(params), value,
+                                         UNITS[unit]))
+
+    record('startup', {}, bench_startup())
+    for length in lengths:
+        record('move', {'length': length}, bench_move(length))
+        record('check_crash', {'length': length}, bench_check_crash(length))
+        record('draw', {'length': length}, bench_draw(length))
+    for maxfood in maxfoods:
+        record('clean_food', {'maxfood': maxfood}, bench_clean_food(maxfood))
+        for players in PLAYERS:
+            for length in FRAME_LENGTHS[:2 if quick else None]:
+                params = {'players': players, 'length': length,
+                          'maxfood': maxfood}
+                record('food_move', params,
+                       bench_food_move(players, length, maxfood))
+                record('frame', params, bench_frame(players, length, maxfood))
+                record('frame_dirty', params,
+                       bench_frame(players, length, maxfood, True))
+    for maxfood in SWARMS[:1 if quick else None]:
+        params = {'players': 2, 'length': 300, 'maxfood': maxfood}
+        record('food_move', params, bench_food_move(2, 300, maxfood))
+    for bots in QUICK_BOTS if quick else BOTS:
+        mean, p99, cpu_p99 = bench_autopilot(bots)
+        record('autopilot', {'bots': bots}, mean)
+        record('autopilot_p99', {'bots': bots}, p99)
+        record('autopilot_cpu_p99', {'bots': bots}, cpu_p99)
+    memory = {}
+    for players, length, maxfood in BOARDS:
+        params = {'players': players, 'length': length, 'maxfood': maxfood}
+        memory[players, length, maxfood] = bench_memory(players, length,
+                                                        maxfood)
+        record('memory', params, memory[players, length, maxfood], 'bytes')
+    # per entity, from the difference between boards
+    record('food_bytes', {}, (memory[2, 10000, 100000] -
+                              memory[2, 10000, 0]) / 100000.0, 'bytes')
+    record('segment_bytes', {}, (memory[2, 10000, 0] -
+                                 memory[1, 10, 0]) / 19990.0, 'bytes')
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+UNITS = {'usec': 'us', 'bytes': 'B'}
+
+
+def key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare(old_path, new_path):
+    old = json.load(open(old_path))
+    new = json.load(open(new_path))
+    before = dict((key(r), r) for r in old['results'])
+    for result in new['results']:
+        name, params = key(result)
+        unit = 'bytes' if 'bytes' in result else 'usec'
+        if unit not in before.get((name, params), ()):
+            continue
+        old_value = before[(name, params)][unit]
+        ratio = result[unit] / old_value
+        print('%-12s %-40s %10.2f -> %10.2f %s  x%.2f' % (
+            name, params, old_value, result[unit], UNITS[unit], ratio))
+
+
+def main(argv):
+    if '--compare' in argv:
+        i = argv.index('--compare')
+        return compare(argv[i + 1], argv[i + 2])
+    output = 'benchmark.json'
+    if '--output' in argv:
+        output = argv[argv.index('--output') + 1]
+    results = run(quick='--quick' in argv)
+    data = {
+        'meta': {
+            'revision': git_revision(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+    out = open(output, 'w')
+    try:
+        json.dump(data, out, indent=1)
+    finally:
+        out.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,791 @@
+"""Display-free snake simulation.
+
+Holds the game rules (movement, crashes, eating, food) without any pygame
+surface, clock or window, so games can be stepped headless as fast as the
+CPU allows. snakegame.py renders on top of it.
+
+NumPy is optional: with it, hard mode moves the whole food swarm in one
+vectorized pass; without it the same pass runs as a Python loop over the
+same arrays and random bits, so both play out identical games.
+"""
+import sys
+import time
+import random
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+UP = 'up'
+DOWN = 'down'
+LEFT = 'left'
+RIGHT = 'right'
+
+DIRECTIONS = {
+    UP: (0, -1),
+    DOWN: (0, 1),
+    LEFT: (-1, 0),
+    RIGHT: (1, 0),
+}
+
+NORMAL = 'normal'
+HARD = 'hard'
+
+#body change events, see Snake.events
+PUSH = 'push'
+POP = 'pop'
+
+#segment orientations, in sprite sheet column order; see Body.tiles
+TILES = ['head_ud', 'head_du', 'head_lr', 'head_rl',
+         'body_horiz', 'body_vert',
+         'flex_rddr', 'flex_luul', 'flex_ruur', 'flex_lddl',
+         'tail_ud', 'tail_du', 'tail_lr', 'tail_rl']
+TILE = dict((name, i) for i, name in enumerate(TILES))
+NO_TILE = -1
+
+#foods in a swarm before numpy beats a plain loop
+VECTORIZE = 32
+
+#turns a snake holds on to while waiting for its next move
+TURN_QUEUE = 3
+
+
+def overlaps(ax, ay, bx, by, size):
+    return abs(ax - bx) < size and abs(ay - by) < size
+
+
+def classify(prev, me, next):
+    """Tile index for segment me given its neighbours towards the head
+    (prev) and the tail (next), either of which may be None."""
+    if prev is None and next is not None:
+        if me[0] < next[0]:
+            return TILE['head_lr']
+        elif me[0] > next[0]:
+            return TILE['head_rl']
+        elif me[1] < next[1]:
+            return TILE['head_ud']
+        elif me[1] > next[1]:
+            return TILE['head_du']
+
+    if next is not None and prev is not None:
+        if me[0] < next[0] and me[1] < prev[1] or \
+            me[0] < prev[0] and me[1] < next[1]:
+            return TILE['flex_rddr']
+
+        elif me[0] < next[0] and me[1] > prev[1] or \
+            me[0] < prev[0] and me[1] > next[1]:
+            return TILE['flex_ruur']
+
+        elif me[0] > next[0] and me[1] > prev[1] or \
+            me[0] > prev[0] and me[1] > next[1]:
+            return TILE['flex_luul']
+
+        elif me[0] > next[0] and me[1] < prev[1] or \
+            me[0] > prev[0] and me[1] < next[1]:
+            return TILE['flex_lddl']
+
+        elif me[0] == prev[0] == next[0]:
+            return TILE['body_vert']
+
+        elif me[1] == prev[1] == next[1]:
+            return TILE['body_horiz']
+
+    if next is None and prev is not None:
+        if me[0] > prev[0]:
+            return TILE['tail_lr']
+        elif me[0] < prev[0]:
+            return TILE['tail_rl']
+        elif me[1] > prev[1]:
+            return TILE['tail_ud']
+        elif me[1] < prev[1]:
+            return TILE['tail_du']
+
+    return NO_TILE
+
+
+class Grid(object):
+    """Per-cell count of snake segments, keyed on bulk-sized cells.
+
+    Snakes keep it up to date as heads are pushed and tails popped, so
+    collision queries cost the same no matter how long the snakes are.
+    Cells outside the arena are not tracked.
+
+    The empty cells are also kept as an unordered set (a dense array plus
+    each cell's slot in it), so picking a random empty cell is O(1) even
+    on a nearly full board.
+    """
+
+    def __init__(self, width, height, bulk=20):
+        self.bulk = bulk
+        self.cols = width // bulk
+        self.rows = height // bulk
+        size = self.cols * self.rows
+        self.cells = array('H', [0]) * size
+        self.free = array('i', range(size))
+        self.slots = array('i', range(size))
+        self.nfree = size
+
+    def index(self, x, y):
+        col = x // self.bulk
+        row = y // self.bulk
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return -1
+
+    def add(self, x, y):
+        i = self.index(x, y)
+        if i != -1:
+            if not self.cells[i]:
+                # swap the last free cell into i's slot
+                slot = self.slots[i]
+                self.nfree -= 1
+                last = self.free[self.nfree]
+                self.free[slot] = last
+                self.slots[last] = slot
+            self.cells[i] += 1
+
+    def remove(self, x, y):
+        i = self.index(x, y)
+        if i != -1:
+            self.cells[i] -= 1
+            if not self.cells[i]:
+                self.free[self.nfree] = i
+                self.slots[i] = self.nfree
+                self.nfree += 1
+
+    def random_free(self, rand):
+        """Top left corner of a random empty cell, or None if full."""
+        if not self.nfree:
+            return None
+        i = self.free[rand.randrange(self.nfree)]
+        return i % self.cols * self.bulk, i // self.cols * self.bulk
+
+    def count(self, x, y):
+        i = self.index(x, y)
+        if i == -1:
+            return 0
+        return self.cells[i]
+
+    def overlaps(self, x, y, size):
+        """True if any segment overlaps the size x size rect at x, y."""
+        bulk = self.bulk
+        for cy in range(y // bulk * bulk, y + size, bulk):
+            for cx in range(x // bulk * bulk, x + size, bulk):
+                if self.count(cx, cy):
+                    return True
+        return False
+
+
+class Body(object):
+    """Ring buffer of snake segment coordinates, head first.
+
+    Pushing a head and popping the tail are O(1) and reuse two integer
+    arrays, which only grow when the snake outgrows them. A third array
+    keeps each segment's TILES index; only the head, the segment behind
+    it and the tail ever change, so it is fixed up on push and pop.
+    """
+
+    __slots__ = ('xs', 'ys', 'tiles', 'start', 'size')
+
+    def __init__(self, capacity=16):
+        self.xs = array('i', [0]) * capacity
+        self.ys = array('i', [0]) * capacity
+        self.tiles = array('b', [NO_TILE]) * capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('body index out of range')
+        j = (self.start + i) % len(self.xs)
+        return self.xs[j], self.ys[j]
+
+    def __iter__(self):
+        xs, ys = self.xs, self.ys
+        capacity = len(xs)
+        for i in range(self.start, self.start + self.size):
+            j = i % capacity
+            yield xs[j], ys[j]
+
+    def segments(self):
+        """Yield (x, y, tile) for every segment, head first."""
+        xs, ys, tiles = self.xs, self.ys, self.tiles
+        capacity = len(xs)
+        for i in range(self.start, self.start + self.size):
+            j = i % capacity
+            yield xs[j], ys[j], tiles[j]
+
+    def tile(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('body index out of range')
+        return self.tiles[(self.start + i) % len(self.xs)]
+
+    def classify(self, i):
+        prev = next = None
+        if i > 0:
+            prev = self[i - 1]
+        if i < self.size - 1:
+            next = self[i + 1]
+        self.tiles[(self.start + i) % len(self.xs)] = \
+            classify(prev, self[i], next)
+
+    def push(self, x, y):
+        if self.size == len(self.xs):
+            self.grow()
+        self.start = (self.start - 1) % len(self.xs)
+        self.xs[self.start] = x
+        self.ys[self.start] = y
+        self.size += 1
+        self.classify(0)
+        if self.size > 1:
+            self.classify(1)
+
+    def pop(self):
+        if not self.size:
+            raise IndexError('pop from empty body')
+        self.size -= 1
+        j = (self.start + self.size) % len(self.xs)
+        if self.size:
+            self.classify(self.size - 1)
+        return self.xs[j], self.ys[j]
+
+    def clear(self):
+        self.start = 0
+        self.size = 0
+
+    def ordered(self, values):
+        end = self.start + self.size
+        if end <= len(values):
+            return values[self.start:end]
+        return values[self.start:] + values[:end - len(values)]
+
+    def cells(self):
+        """Copies of the x, y and tile arrays in head first order."""
+        return self.ordered(self.xs), self.ordered(self.ys), \
+            self.ordered(self.tiles)
+
+    def load(self, xs, ys, tiles):
+        """Replace the contents with head first x, y and tile sequences."""
+        size = len(xs)
+        spare = max(16 - size, 0)
+        self.xs = array('i', xs) + array('i', [0]) * spare
+        self.ys = array('i', ys) + array('i', [0]) * spare
+        self.tiles = array('b', tiles) + array('b', [NO_TILE]) * spare
+        self.start = 0
+        self.size = size
+
+    def grow(self):
+        capacity = len(self.xs)
+        order = [(self.start + i) % capacity for i in range(self.size)]
+        xs = array('i', [self.xs[j] for j in order])
+        ys = array('i', [self.ys[j] for j in order])
+        tiles = array('b', [self.tiles[j] for j in order])
+        xs.extend(array('i', [0]) * capacity)
+        ys.extend(array('i', [0]) * capacity)
+        tiles.extend(array('b', [NO_TILE]) * capacity)
+        self.xs, self.ys, self.tiles = xs, ys, tiles
+        self.start = 0
+
+
+def _swarm_field(name, cast=None):
+    def get(food):
+        value = getattr(food.swarm, name)[food.slot]
+        return value if cast is None else cast(value)
+
+    def set(food, value):
+        getattr(food.swarm, name)[food.slot] = value
+    return property(get, set)
+
+
+class Swarm(object):
+    """Positions and directions of a set of foods in parallel arrays.
+
+    Every Food field is pooled here, the Food objects only know their
+    slot. Removing a food moves the last one into its slot, so the arrays
+    stay dense and move() can advance every food in one pass.
+    """
+
+    #array name and typecode, in Food.__init__ argument order
+    FIELDS = (('xs', 'i'), ('ys', 'i'), ('dxs', 'b'), ('dys', 'b'),
+              ('bulks', 'H'), ('points', 'i'), ('borns', 'd'),
+              ('eaten', 'B'))
+
+    def __init__(self, capacity=16):
+        for name, typecode in self.FIELDS:
+            setattr(self, name, array(typecode, [0]) * capacity)
+        self.foods = []
+
+    def __len__(self):
+        return len(self.foods)
+
+    def arrays(self):
+        return [getattr(self, name) for name, typecode in self.FIELDS]
+
+    def add(self, food, values):
+        slot = len(self.foods)
+        arrays = self.arrays()
+        if slot == len(self.xs):
+            for column in arrays:
+                column.extend(column)
+        for column, value in zip(arrays, values):
+            column[slot] = value
+        food.swarm = self
+        food.slot = slot
+        self.foods.append(food)
+
+    def values(self, slot):
+        return [column[slot] for column in self.arrays()]
+
+    def remove(self, food):
+        """Take food out; it keeps its values in a swarm of its own."""
+        slot = food.slot
+        values = self.values(slot)
+        last = self.foods.pop()
+        if last is not food:
+            end = len(self.foods)
+            self.foods[slot] = last
+            last.slot = slot
+            for column in self.arrays():
+                column[slot] = column[end]
+        Swarm(1).add(food, values)
+
+    def adopt(self, food):
+        if food.swarm is not self:
+            values = food.swarm.values(food.slot)
+            food.swarm.remove(food)
+            self.add(food, values)
+
+    def overlapping(self, x, y, size):
+        """Foods overlapping the size x size square at x, y."""
+        n = len(self.foods)
+        if numpy is not None and n > VECTORIZE:
+            xs = numpy.frombuffer(self.xs, numpy.intc, n)
+            ys = numpy.frombuffer(self.ys, numpy.intc, n)
+            hits = numpy.flatnonzero((numpy.abs(xs - x) < size) &
+                                     (numpy.abs(ys - y) < size))
+            return [self.foods[i] for i in hits]
+        xs, ys = self.xs, self.ys
+        return [self.foods[i] for i in range(n)
+                if abs(xs[i] - x) < size and abs(ys[i] - y) < size]
+
+    def move(self, rolls, sim):
+        """Advance every food a pixel. rolls holds 16 random bits per
+        food: the lowest says whether to pick a new direction, the rest
+        pick one of the nine. A step out of the arena or onto a snake is
+        taken back, the new direction is kept."""
+        if numpy is not None and len(self.foods) > VECTORIZE:
+            return self.move_arrays(rolls, sim)
+        values = array('H')
+        values.frombytes(rolls)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        xs, ys, dxs, dys = self.xs, self.ys, self.dxs, self.dys
+        bulk = sim.bulk
+        width, height = sim.width, sim.height
+        overlaps = sim.grid.overlaps
+        for i in range(len(self.foods)):
+            roll = values[i]
+            if roll & 1:
+                turn = (roll >> 1) % 9
+                dxs[i] = turn % 3 - 1
+                dys[i] = turn // 3 - 1
+            x = xs[i] + dxs[i]
+            y = ys[i] + dys[i]
+            if 0 <= x and 0 <= y and x + bulk <= width and \
+                    y + bulk <= height and not overlaps(x, y, bulk):
+                xs[i] = x
+                ys[i] = y
+
+    def move_arrays(self, rolls, sim):
+        n = len(self.foods)
+        grid = sim.grid
+        bulk = sim.bulk
+        xs = numpy.frombuffer(self.xs, numpy.intc, n)
+        ys = numpy.frombuffer(self.ys, numpy.intc, n)
+        dxs = numpy.frombuffer(self.dxs, numpy.int8, n)
+        dys = numpy.frombuffer(self.dys, numpy.int8, n)
+        rolls = numpy.frombuffer(rolls, '<u2', n)
+
+        turning = (rolls & 1).astype(bool)
+        turns = (rolls[turning] >> 1) % 9
+        dxs[turning] = turns % 3 - 1
+        dys[turning] = turns // 3 - 1
+
+        nx = xs + dxs
+        ny = ys + dys
+        ok = (nx >= 0) & (ny >= 0) & (nx + bulk <= sim.width) & \
+            (ny + bulk <= sim.height)
+        # the up to four cells under each food, as in Grid.overlaps
+        cells = numpy.frombuffer(grid.cells, numpy.uint16)
+        size = grid.bulk
+        for cols in (nx // size, (nx + bulk - 1) // size):
+            for rows in (ny // size, (ny + bulk - 1) // size):
+                tracked = ok & (cols < grid.cols) & (rows < grid.rows)
+                index = numpy.where(tracked, rows * grid.cols + cols, 0)
+                ok &= ~(tracked & (cells[index] > 0))
+        xs[ok] = nx[ok]
+        ys[ok] = ny[ok]
+
+
+class Food(object):
+    """A bug. Its fields live in a Swarm, its own until it is added to a
+    Simulation."""
+
+    __slots__ = ('swarm', 'slot')
+
+    x = _swarm_field('xs')
+    y = _swarm_field('ys')
+    dir_x = _swarm_field('dxs')
+    dir_y = _swarm_field('dys')
+    bulk = _swarm_field('bulks')
+    points = _swarm_field('points')
+    born = _swarm_field('borns')
+    eaten = _swarm_field('eaten', bool)
+
+    def __init__(self, x, y, bulk=20, points=0, born=0, swarm=None):
+        if swarm is None:
+            swarm = Swarm(1)
+        swarm.add(self, (x, y, -1, 1, bulk, points, born, False))
+
+    def being_eaten(self, x, y):
+        return overlaps(self.x, self.y, x, y, self.bulk)
+
+    def has_been_eaten(self):
+        self.eaten = True
+
+    def nutritional_value(self):
+        return self.points // 10
+
+
+class Snake(object):
+    __slots__ = ('number', 'name', 'startpos', 'initlength', 'length', 'bulk',
+                 'body', 'x', 'y', 'dir_x', 'dir_y', 'crashed', 'score',
+                 'lives', 'playing', 'speed', 'elapsed', 'needs_to_move',
+                 'queued', 'turned_at', 'grid', 'events')
+
+    def __init__(self, number, startpos, initlength=10, bulk=20, name=''):
+        self.number = number
+        self.name = name
+        # snap to the bulk lattice so every snake shares the same cells
+        startpos = (int(startpos[0]) // bulk * bulk,
+                    int(startpos[1]) // bulk * bulk)
+        self.startpos = startpos
+        self.initlength = initlength
+        self.length = initlength
+        self.bulk = bulk
+        self.body = Body()
+        self.x, self.y = startpos
+        self.dir_x = 0
+        self.dir_y = -1 * bulk
+        self.crashed = False
+        self.score = 0
+        self.lives = 3
+        self.playing = True
+        self.speed = 160 #ms
+        self.elapsed = 0
+        self.needs_to_move = False
+        # (direction, time) of turns made before the next move
+        self.queued = []
+        # when the turn the next move takes was made
+        self.turned_at = None
+        self.grid = None
+        # set to a list to record (PUSH|POP, x, y) body changes
+        self.events = None
+
+    def push_head(self, x, y):
+        self.body.push(x, y)
+        if self.grid is not None:
+            self.grid.add(x, y)
+        if self.events is not None:
+            self.events.append((PUSH, x, y))
+
+    def pop_tail(self):
+        x, y = self.body.pop()
+        if self.grid is not None:
+            self.grid.remove(x, y)
+        if self.events is not None:
+            self.events.append((POP, x, y))
+
+    def clear_body(self):
+        while self.body:
+            self.pop_tail()
+
+    def turn(self, direction):
+        """Head towards direction from the next move on. A turn made
+        while an earlier one still waits for its move is queued and taken
+        on the move after; reversals and turns that change nothing are
+        judged against the last queued direction and ignored."""
+        dx, dy = DIRECTIONS[direction]
+        dx *= self.bulk
+        dy *= self.bulk
+        if self.queued:
+            last_x, last_y = DIRECTIONS[self.queued[-1][0]]
+            last_x *= self.bulk
+            last_y *= self.bulk
+        else:
+            last_x, last_y = self.dir_x, self.dir_y
+        if (dx and dx == -last_x) or (dy and dy == -last_y) or \
+                (dx, dy) == (last_x, last_y):
+            return
+        if not self.needs_to_move:
+            self.dir_x = dx
+            self.dir_y = dy
+            self.needs_to_move = True
+            self.turned_at = time.perf_counter()
+        elif len(self.queued) < TURN_QUEUE:
+            self.queued.append((direction, time.perf_counter()))
+
+    def next_turn(self, sim):
+        """Called after every move: logs how long the turn it carried out
+        waited for it, then takes the next queued turn, if any."""
+        if self.turned_at is not None and sim.profiler is not None:
+            sim.profiler.sample('input_latency',
+                                (time.perf_counter() - self.turned_at) * 1000)
+        self.turned_at = None
+        self.needs_to_move = False
+        if self.queued:
+            direction, self.turned_at = self.queued.pop(0)
+            dx, dy = DIRECTIONS[direction]
+            self.dir_x = dx * self.bulk
+            self.dir_y = dy * self.bulk
+            self.needs_to_move = True
+
+    def update(self, dt, sim):
+        self.elapsed += dt
+        if not self.elapsed > self.speed:
+            return
+        cycles = int(self.elapsed / self.speed)
+        # keep the remainder so moves stay exactly speed ms apart
+        self.elapsed -= cycles * self.speed
+
+        for i in range(cycles):
+            self.x += self.dir_x
+            self.y += self.dir_y
+            self.push_head(self.x, self.y)
+            if self.length != 0 and len(self.body) > self.length:
+                self.pop_tail()
+            self.next_turn(sim)
+            # check every cell, a long dt must not jump over a wall
+            self.crashed = self.check_crash(sim)
+            if self.crashed:
+                break
+
+    def check_crash(self, sim):
+        head = self.body[0]
+        if not sim.contains(head[0], head[1], self.bulk):
+            return True
+        # segments in the head cell, not counting any snake's own head
+        hits = sim.grid.count(head[0], head[1])
+        for snake in sim.snakes:
+            if snake.body and snake.body[0] == head:
+                hits -= 1
+        return hits > 0
+
+    def check_ate(self, food):
+        """Eat any food under the head, returns how many were eaten."""
+        if not len(self.body):
+            return 0
+        eaten = 0
+        x, y = self.body[0]
+        for f in food:
+            if f.being_eaten(x, y):
+                self.score += f.points
+                self.speed -= 0.1
+                self.length += f.nutritional_value()
+                f.has_been_eaten()
+                eaten += 1
+        return eaten
+
+    def reset(self):
+        self.clear_body()
+        self.x, self.y = self.startpos
+        self.dir_x, self.dir_y = 0, -1 * self.bulk
+        self.needs_to_move = False
+        self.queued = []
+        self.turned_at = None
+        self.score = 0
+        self.crashed = False
+        self.playing = True
+
+    def full_reset(self):
+        self.reset()
+        self.length = self.initlength
+        self.lives = 3
+        self.speed = 160 #ms, Simulation.set_difficulty may change it
+        self.elapsed = 0
+
+    def handle_crash(self):
+        self.lives -= 1
+        if self.lives > 0:
+            score = self.score
+            self.reset()
+            self.score = score
+        else:
+            self.playing = False
+
+
+class Simulation(object):
+    """Game state advanced one fixed tick at a time by step()."""
+
+    def __init__(self, width=800, height=575, bulk=20, maxfood=1,
+                 difficulty=NORMAL, tick=1000.0 / 60, seed=None):
+        self.width = width
+        self.height = height
+        self.bulk = bulk
+        self.maxfood = maxfood
+        self.difficulty = difficulty
+        self.tick = tick
+        self.random = random.Random(seed)
+        self.snakes = []
+        self.swarm = Swarm()
+        # set when something was eaten, see clean_food
+        self.food_eaten = False
+        self.time = 0
+        self.grid = Grid(width, height, bulk)
+        # replay.Recorder logging every tick, if any
+        self.recorder = None
+        # profiler.FrameProfiler timing the phases of step(), if any
+        self.profiler = None
+
+    @property
+    def food(self):
+        """The foods on the board, in no particular order."""
+        return self.swarm.foods
+
+    def add_snake(self, snake):
+        self.snakes.append(snake)
+        snake.grid = self.grid
+        for x, y in snake.body:
+            self.grid.add(x, y)
+        return snake
+
+    def remove_snake(self, snake):
+        snake.clear_body()
+        self.snakes.remove(snake)
+        snake.grid = None
+
+    def set_difficulty(self, difficulty):
+        self.difficulty = difficulty
+        if difficulty == HARD:
+            for snake in self.snakes:
+                snake.speed = 50
+
+    @property
+    def running(self):
+        for snake in self.snakes:
+            if snake.playing:
+                return True
+        return False
+
+    def contains(self, x, y, size):
+        return 0 <= x and 0 <= y and \
+            x + size <= self.width and y + size <= self.height
+
+    def food_points(self, x, y):
+        x_cartesian = abs((x - self.width // 2) // 10)
+        y_cartesian = abs((y - self.height // 2) // 10)
+        return (x_cartesian + y_cartesian) // 2
+
+    def spawn_food(self):
+        """Put food on a random cell free of snakes; None if there is
+        no such cell."""
+        cell = self.grid.random_free(self.random)
+        if cell is None:
+            return None
+        x, y = cell
+        return Food(x, y, self.bulk, self.food_points(x, y), self.time,
+                    self.swarm)
+
+    def add_food(self, food):
+        self.swarm.adopt(food)
+
+    def clean_food(self):
+        if self.food_eaten:
+            swarm = self.swarm
+            for f in [f for f, eaten in zip(swarm.foods, swarm.eaten)
+                      if eaten]:
+                swarm.remove(f)
+            self.food_eaten = False
+        while len(self.food) < self.maxfood:
+            if self.spawn_food() is None:
+                break
+
+    def move_food(self):
+        """Hard mode: every bug wanders a pixel, see Swarm.move."""
+        count = len(self.swarm)
+        if count:
+            rolls = self.random.getrandbits(16 * count).to_bytes(2 * count,
+                                                                 'little')
+            self.swarm.move(rolls, self)
+
+    def step(self, actions=None, dt=None):
+        """Advance the game by one tick.
+
+        actions maps snake index to a direction, a list of directions to
+        turn in order, or None; dt overrides the fixed tick length in
+        milliseconds.
+        """
+        if dt is None:
+            dt = self.tick
+        if actions:
+            if isinstance(actions, dict):
+                actions = actions.items()
+            else:
+                actions = enumerate(actions)
+            for i, direction in actions:
+                if isinstance(direction, list):
+                    for each in direction:
+                        self.snakes[i].turn(each)
+                elif direction is not None:
+                    self.snakes[i].turn(direction)
+        if self.recorder is not None:
+            self.recorder.record(self, dt)
+
+        for snake in self.snakes:
+            if not snake.playing:
+                continue
+            head = snake.body[0] if snake.body else (snake.x, snake.y)
+            if snake.check_ate(self.swarm.overlapping(head[0], head[1],
+                                                      self.bulk)):
+                self.food_eaten = True
+            snake.update(dt, self)
+            if snake.crashed:
+                snake.handle_crash()
+        if self.profiler is not None:
+            self.profiler.mark('snakes')
+
+        self.clean_food()
+        if self.profiler is not None:
+            self.profiler.mark('clean_food')
+        if self.difficulty == HARD:
+            self.move_food()
+            if self.profiler is not None:
+                self.profiler.mark('move_food')
+        self.time += dt
+        if self.recorder is not None:
+            self.recorder.settle(self)
+
+    def reset(self, seed=None):
+        """Start a new game with the same snakes, reseeding if given."""
+        for snake in self.snakes:
+            snake.full_reset()
+        # a fresh grid, so free cells are handed out as in a new game
+        self.grid = Grid(self.width, self.height, self.bulk)
+        for snake in self.snakes:
+            snake.grid = self.grid
+        self.set_difficulty(self.difficulty)
+        self.swarm = Swarm()
+        self.food_eaten = False
+        self.time = 0
+        if seed is not None:
+            self.random.seed(seed)
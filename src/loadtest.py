@@ -0,0 +1,190 @@
+"""Load test for server.py: hundreds of simulated players on localhost.
+
+Every bot joins, turns at random, respawns when out of lives and keeps a
+mirror of the arena from the deltas. At the end each bot asks for a full
+snapshot and checks its mirror against it, so the run also verifies the
+delta stream.
+
+    python loadtest.py --clients 300 --seconds 20
+    python loadtest.py --clients 300 --spawn-server
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import deque
+
+import engine
+import server
+
+
+class Mirror(object):
+    """Client side copy of the arena rebuilt from server messages."""
+
+    def __init__(self):
+        self.snakes = {}
+        self.status = {}
+        self.food = {}
+
+    def load(self, message):
+        self.snakes = {}
+        self.status = {}
+        for entry in message['snakes']:
+            snake_id, name, body = entry[:3]
+            self.snakes[snake_id] = deque(tuple(cell) for cell in body)
+            self.status[snake_id] = entry[3:]
+        self.food = dict((food_id, (x, y)) for food_id, x, y in message['food'])
+
+    def apply(self, message):
+        for snake_id, name in message.get('j', ()):
+            self.snakes.setdefault(snake_id, deque())
+        for snake_id in message.get('l', ()):
+            self.snakes.pop(snake_id, None)
+            self.status.pop(snake_id, None)
+        for snake_id, pushes, pops in message.get('s', ()):
+            body = self.snakes.get(snake_id)
+            if body is None:
+                continue
+            for x, y in pushes:
+                body.appendleft((x, y))
+            for i in range(pops):
+                body.pop()
+        for entry in message.get('sc', ()):
+            if entry[0] in self.snakes:
+                self.status[entry[0]] = entry[1:]
+        for food_id, x, y in message.get('f+', ()):
+            self.food[food_id] = (x, y)
+        for food_id, x, y in message.get('fm', ()):
+            self.food[food_id] = (x, y)
+        for food_id in message.get('f-', ()):
+            self.food.pop(food_id, None)
+
+    def same_as(self, message):
+        other = Mirror()
+        other.load(message)
+        return self.snakes == other.snakes and self.food == other.food and \
+            self.status == other.status
+
+
+class Stats(object):
+    def __init__(self):
+        self.connected = 0
+        self.messages = 0
+        self.bytes = 0
+        self.turns = 0
+        self.verified = 0
+        self.mismatched = 0
+        self.gaps = []
+
+
+async def bot(host, port, number, seconds, turn_every, stats):
+    rand = random.Random(number)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(server.encode({'t': 'join', 'name': 'bot%d' % number}))
+    welcome = json.loads(await reader.readline())
+    snake_id = welcome['id']
+    mirror = Mirror()
+    mirror.load(json.loads(await reader.readline()))
+    stats.connected += 1
+
+    deadline = time.time() + seconds
+    next_turn = time.time()
+    last_tick = None
+    verifying = False
+    while True:
+        now = time.time()
+        if now >= deadline and not verifying:
+            writer.write(server.encode({'t': 'full'}))
+            verifying = True
+        elif now >= next_turn and not verifying:
+            direction = rand.choice(list(engine.DIRECTIONS))
+            writer.write(server.encode({'t': 'turn', 'd': direction}))
+            stats.turns += 1
+            next_turn = now + turn_every * rand.uniform(0.5, 1.5)
+            status = mirror.status.get(snake_id)
+            if status and not status[2]:
+                writer.write(server.encode({'t': 'respawn'}))
+
+        try:
+            line = await asyncio.wait_for(reader.readline(), 0.05)
+        except asyncio.TimeoutError:
+            continue
+        if not line:
+            break
+        stats.messages += 1
+        stats.bytes += len(line)
+        message = json.loads(line)
+        if message['t'] == 'd':
+            mirror.apply(message)
+            if last_tick is not None:
+                stats.gaps.append(now - last_tick)
+            last_tick = now
+        elif message['t'] == 'full' and verifying:
+            if mirror.same_as(message):
+                stats.verified += 1
+            else:
+                stats.mismatched += 1
+            break
+    writer.close()
+
+
+async def run(args, stats):
+    tasks = []
+    for number in range(args.clients):
+        tasks.append(asyncio.ensure_future(
+            bot(args.host, args.port, number, args.seconds,
+                args.turn_every, stats)))
+        # spread the joins out a little, like real players
+        await asyncio.sleep(0.002)
+    await asyncio.gather(*tasks)
+
+
+async def run_with_server(args, stats):
+    game_server = server.GameServer(args.width, args.height, seed=1)
+    serving = asyncio.ensure_future(game_server.serve(args.host, args.port))
+    await asyncio.sleep(0.2)
+    started = time.time()
+    await run(args, stats)
+    serving.cancel()
+    return game_server.ticks / (time.time() - started)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='SnakeGame server load test')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--turn-every', type=float, default=0.5)
+    parser.add_argument('--spawn-server', action='store_true',
+                        help='run the server in this process too')
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    args = parser.parse_args(argv[1:])
+
+    stats = Stats()
+    started = time.time()
+    if args.spawn_server:
+        tick_rate = asyncio.run(run_with_server(args, stats))
+    else:
+        asyncio.run(run(args, stats))
+        tick_rate = None
+    elapsed = time.time() - started
+
+    gaps = sorted(stats.gaps) or [0]
+    print('clients connected: %d, verified: %d, mismatched: %d' % (
+        stats.connected, stats.verified, stats.mismatched))
+    print('messages: %d (%.0f/s), %.1f KB/s down, %.1f bytes/message' % (
+        stats.messages, stats.messages / elapsed,
+        stats.bytes / elapsed / 1024, stats.bytes / max(stats.messages, 1)))
+    print('turns sent: %d, delta gap p50 %.1f ms, p99 %.1f ms' % (
+        stats.turns, gaps[len(gaps) // 2] * 1000,
+        gaps[len(gaps) * 99 // 100] * 1000))
+    if tick_rate is not None:
+        print('server ticks/s: %.1f' % tick_rate)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
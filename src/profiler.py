@@ -0,0 +1,136 @@
+"""Per-phase frame timing for the game loop.
+
+MainApp and Simulation call mark(phase) as each part of a frame finishes;
+the time since the previous mark is charged to that phase. The last few
+hundred frames are kept for the on-screen overlay, and every frame also
+lands in fixed-size histograms that export() writes out for offline
+analysis, so memory stays flat however long the session runs.
+
+Measurements that are not frame phases, like the time from a key press
+to the move that carries it out (engine.Snake.next_turn), go to
+sample(name, ms) and are kept the same way.
+"""
+import sys
+import json
+import time
+from collections import deque
+
+
+#phases that are waiting rather than work, left out of frame time
+IDLE_PHASES = ('tick',)
+
+
+class FrameProfiler(object):
+    def __init__(self, window=300, bucket=0.25, buckets=200,
+                 sample_bucket=2.0):
+        self.window = deque(maxlen=window)
+        self.bucket = bucket # ms
+        self.buckets = buckets
+        self.sample_bucket = sample_bucket # ms
+        self.histograms = {}
+        self.samples = {}    # name -> (histogram, recent values)
+        self.phases = []
+        self.frames = 0
+        self.current = {}
+        self.started = self.last = None
+        self.blocks = 0
+
+    def begin_frame(self):
+        self.current = {}
+        self.blocks = sys.getallocatedblocks()
+        self.started = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if self.last is None:
+            return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0) + \
+            (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self):
+        if self.started is None:
+            return
+        work = 0
+        for phase, ms in self.current.items():
+            if phase not in self.histograms:
+                self.histograms[phase] = [0] * (self.buckets + 1)
+                self.phases.append(phase)
+            self.add(self.histograms[phase], ms)
+            if phase not in IDLE_PHASES:
+                work += ms
+        if 'frame' not in self.histograms:
+            self.histograms['frame'] = [0] * (self.buckets + 1)
+        self.add(self.histograms['frame'], work)
+        blocks = sys.getallocatedblocks() - self.blocks
+        self.window.append((work, self.current, blocks))
+        self.frames += 1
+        self.started = self.last = None
+
+    def add(self, histogram, ms, bucket=None):
+        # the last bucket collects everything past the range
+        bucket = bucket or self.bucket
+        histogram[min(int(ms / bucket), self.buckets)] += 1
+
+    def sample(self, name, ms):
+        if name not in self.samples:
+            self.samples[name] = ([0] * (self.buckets + 1),
+                                  deque(maxlen=self.window.maxlen))
+        histogram, recent = self.samples[name]
+        self.add(histogram, ms, self.sample_bucket)
+        recent.append(ms)
+
+    def percentiles(self, points=(50, 95, 99), values=None):
+        """Percentiles in ms of values, by default the frame work times
+        over the recent window."""
+        if values is None:
+            values = [work for work, phases, blocks in self.window]
+        times = sorted(values)
+        if not times:
+            return [0.0 for p in points]
+        return [times[min(len(times) - 1, len(times) * p // 100)]
+                for p in points]
+
+    def phase_means(self):
+        totals = {}
+        for work, phases, blocks in self.window:
+            for phase, ms in phases.items():
+                totals[phase] = totals.get(phase, 0) + ms
+        count = max(len(self.window), 1)
+        return [(phase, totals.get(phase, 0) / count) for phase in self.phases]
+
+    def mean_blocks(self):
+        if not self.window:
+            return 0
+        return sum(blocks for work, phases, blocks in self.window) / \
+            float(len(self.window))
+
+    def overlay_lines(self):
+        p50, p95, p99 = self.percentiles()
+        lines = ['frame p50 %.2f  p95 %.2f  p99 %.2f ms  blocks %+.0f' % (
+            p50, p95, p99, self.mean_blocks())]
+        slowest = sorted(self.phase_means(), key=lambda item: -item[1])
+        lines.append('  '.join('%s %.2f' % (phase, ms) for phase, ms in
+                               slowest if phase not in IDLE_PHASES)[:80])
+        for name in sorted(self.samples):
+            p50, p95, p99 = self.percentiles(values=self.samples[name][1])
+            lines.append('%s p50 %.1f  p95 %.1f  p99 %.1f ms' % (
+                name, p50, p95, p99))
+        return lines
+
+    def export(self, path):
+        edges = [i * self.bucket for i in range(self.buckets + 1)]
+        data = {
+            'frames': self.frames,
+            'bucket_ms': self.bucket,
+            'edges_ms': edges,
+            'histograms': self.histograms,
+            'sample_bucket_ms': self.sample_bucket,
+            'samples': dict((name, histogram) for name, (histogram, recent)
+                            in self.samples.items()),
+        }
+        out = open(path, 'w')
+        try:
+            json.dump(data, out)
+        finally:
+            out.close()
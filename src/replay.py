@@ -0,0 +1,305 @@
+"""Deterministic replays: the seed plus every tick's dt and turns.
+
+Simulation randomness all comes from its seeded generator, so a game is
+reproduced exactly by rebuilding the simulation from the recorded header
+and feeding step() the same dt and turns. Turns are captured by diffing
+snake directions and turn queues across ticks, so keyboard input and
+controllers are recorded the same way.
+
+File layout: MAGIC, a struct-packed header (seed, arena, players) and a
+digest of the final state, then the zlib-compressed tick stream. Each
+tick is an optional ACTIONS marker with its turns followed by a dt code.
+Hour-long sessions come out at a few tens of kilobytes.
+
+    python replay.py FILE...   play back and verify recordings
+    python replay.py --check   verify a recorded "play again" game
+"""
+import sys
+import time
+import zlib
+import struct
+
+import engine
+import autopilot
+
+
+MAGIC = b'SNKR'
+VERSION = 5
+
+#tick stream codes
+VARINT_DT = 250
+FLOAT_DT = 251
+DEFAULT_DT = 252
+ACTIONS = 253
+
+DIRECTION_CODES = [engine.UP, engine.DOWN, engine.LEFT, engine.RIGHT]
+
+
+class ReplayError(Exception):
+    pass
+
+
+def write_varint(buf, value):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def write_string(buf, text):
+    raw = text.encode('utf-8')
+    write_varint(buf, len(raw))
+    buf.extend(raw)
+
+
+def read_string(data, pos):
+    length, pos = read_varint(data, pos)
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+def direction_of(snake):
+    for name, (dx, dy) in engine.DIRECTIONS.items():
+        if (dx * snake.bulk, dy * snake.bulk) == (snake.dir_x, snake.dir_y):
+            return name
+
+
+def digest(sim):
+    """Final state summary compared after playback."""
+    return [sim.time] + [(s.score, s.lives, len(s.body)) for s in sim.snakes]
+
+
+class Recorder(object):
+    """Attach as sim.recorder before the first step()."""
+
+    def __init__(self, sim, seed):
+        self.seed = seed
+        self.width = sim.width
+        self.height = sim.height
+        self.bulk = sim.bulk
+        self.maxfood = sim.maxfood
+        self.difficulty = sim.difficulty
+        self.tick = sim.tick
+        self.players = [(s.number, s.name, s.startpos, s.initlength)
+                        for s in sim.snakes]
+        self.ticks = 0
+        self.stream = bytearray()
+        self.directions = None
+        self.settle(sim)
+
+    def record(self, sim, dt):
+        """Log one tick; called by step() once its actions are applied."""
+        stream = self.stream
+        turns = []
+        for i, snake in enumerate(sim.snakes):
+            direction, queued = self.directions[i]
+            if (snake.dir_x, snake.dir_y) != direction:
+                turns.append(i << 2 | DIRECTION_CODES.index(direction_of(snake)))
+            for name, made in snake.queued[queued:]:
+                turns.append(i << 2 | DIRECTION_CODES.index(name))
+        if turns:
+            stream.append(ACTIONS)
+            stream.append(len(turns))
+            stream.extend(turns)
+
+        if dt == self.tick:
+            stream.append(DEFAULT_DT)
+        elif dt == int(dt) and 0 <= dt < VARINT_DT:
+            stream.append(int(dt))
+        elif dt == int(dt) and dt >= 0:
+            stream.append(VARINT_DT)
+            write_varint(stream, int(dt))
+        else:
+            stream.append(FLOAT_DT)
+            stream.extend(struct.pack('<d', dt))
+        self.ticks += 1
+
+    def settle(self, sim):
+        """Remember directions and queued turns after a tick, so the
+        next one only logs turns made since."""
+        self.directions = [((s.dir_x, s.dir_y), len(s.queued))
+                           for s in sim.snakes]
+
+    def dumps(self, sim):
+        buf = bytearray(MAGIC)
+        buf.append(VERSION)
+        buf.extend(struct.pack('<IHHHHd', self.seed, self.width, self.height,
+                               self.bulk, self.maxfood, self.tick))
+        write_string(buf, self.difficulty)
+        buf.append(len(self.players))
+        for number, name, startpos, initlength in self.players:
+            buf.append(number)
+            write_string(buf, name)
+            buf.extend(struct.pack('<hhH', startpos[0], startpos[1],
+                                   initlength))
+        final = digest(sim)
+        write_varint(buf, self.ticks)
+        buf.extend(struct.pack('<d', final[0]))
+        for score, lives, length in final[1:]:
+            write_varint(buf, score)
+            write_varint(buf, max(lives, 0))
+            write_varint(buf, length)
+        buf.extend(zlib.compress(bytes(self.stream), 9))
+        return bytes(buf)
+
+    def save(self, sim, path):
+        replay_file = open(path, 'wb')
+        try:
+            replay_file.write(self.dumps(sim))
+        finally:
+            replay_file.close()
+
+
+class Replay(object):
+    def __init__(self, data):
+        data = bytearray(data)
+        if data[:4] != MAGIC:
+            raise ReplayError('not a replay file')
+        if data[4] != VERSION:
+            raise ReplayError('unsupported replay version %s' % data[4])
+        pos = 5
+        (self.seed, self.width, self.height, self.bulk, self.maxfood,
+         self.tick) = struct.unpack_from('<IHHHHd', data, pos)
+        pos += struct.calcsize('<IHHHHd')
+        self.difficulty, pos = read_string(data, pos)
+        self.players = []
+        count = data[pos]
+        pos += 1
+        for i in range(count):
+            number = data[pos]
+            name, pos = read_string(data, pos + 1)
+            x, y, initlength = struct.unpack_from('<hhH', data, pos)
+            pos += struct.calcsize('<hhH')
+            self.players.append((number, name, (x, y), initlength))
+        self.ticks, pos = read_varint(data, pos)
+        self.digest = list(struct.unpack_from('<d', data, pos))
+        pos += 8
+        for player in self.players:
+            score, pos = read_varint(data, pos)
+            lives, pos = read_varint(data, pos)
+            length, pos = read_varint(data, pos)
+            self.digest.append((score, lives, length))
+        self.stream = bytearray(zlib.decompress(bytes(data[pos:])))
+
+    @classmethod
+    def load(cls, path):
+        replay_file = open(path, 'rb')
+        try:
+            return cls(replay_file.read())
+        finally:
+            replay_file.close()
+
+    def simulation(self, snakes=None):
+        """A fresh Simulation set up like the recorded one. snakes may
+        supply ready made Snake objects (e.g. drawable Players) in seat
+        order, otherwise plain engine snakes are created."""
+        sim = engine.Simulation(self.width, self.height, self.bulk,
+                                self.maxfood, self.difficulty, self.tick,
+                                self.seed)
+        for i, (number, name, startpos, initlength) in enumerate(self.players):
+            if snakes is None:
+                snake = engine.Snake(number, startpos, initlength,
+                                     self.bulk, name)
+            else:
+                snake = snakes[i]
+            sim.add_snake(snake)
+        sim.set_difficulty(self.difficulty)
+        return sim
+
+    def __iter__(self):
+        """Yield (dt, actions) for every tick, actions as step() takes
+        them."""
+        data = self.stream
+        pos = 0
+        end = len(data)
+        while pos < end:
+            actions = None
+            code = data[pos]
+            pos += 1
+            if code == ACTIONS:
+                actions = {}
+                for turn in data[pos + 1:pos + 1 + data[pos]]:
+                    actions.setdefault(turn >> 2, []).append(
+                        DIRECTION_CODES[turn & 3])
+                pos += 1 + data[pos]
+                code = data[pos]
+                pos += 1
+            if code == DEFAULT_DT:
+                dt = self.tick
+            elif code == VARINT_DT:
+                dt, pos = read_varint(data, pos)
+            elif code == FLOAT_DT:
+                dt = struct.unpack_from('<d', data, pos)[0]
+                pos += 8
+            else:
+                dt = code
+            yield dt, actions
+
+    def verify(self, sim):
+        final = digest(sim)
+        final[1:] = [(score, max(lives, 0), length)
+                     for score, lives, length in final[1:]]
+        return final == self.digest
+
+
+def play(replay, sim=None):
+    """Run a replay headless as fast as possible; returns the simulation."""
+    if sim is None:
+        sim = replay.simulation()
+    for dt, actions in replay:
+        sim.step(actions, dt)
+    return sim
+
+
+def check_play_again(difficulty=engine.NORMAL, seed=1, max_ticks=20000):
+    """Record a second game on a reset simulation, as "play again" does
+    after a first one, and play the recording back; True if it matches."""
+    sim = engine.Simulation(difficulty=difficulty, seed=seed)
+    for number, startpos in ((1, (400, 287)), (2, (266, 191))):
+        sim.add_snake(engine.Snake(number, startpos))
+    sim.set_difficulty(difficulty)
+    pilots = [autopilot.Autopilot() for snake in sim.snakes]
+    recorded = None
+    for game in range(2):
+        if game:
+            sim.reset(seed + 1)
+            recorded = Recorder(sim, seed + 1)
+            sim.recorder = recorded
+        for tick in range(max_ticks):
+            if not sim.running:
+                break
+            sim.step([pilot(sim, snake)
+                      for pilot, snake in zip(pilots, sim.snakes)])
+    replay = Replay(recorded.dumps(sim))
+    return replay.verify(play(replay))
+
+
+def main(argv):
+    if '--check' in argv:
+        for difficulty in (engine.NORMAL, engine.HARD):
+            print('play again, %s: %s' % (
+                difficulty, 'ok' if check_play_again(difficulty)
+                else 'MISMATCH'))
+        return
+    for path in argv[1:]:
+        replay = Replay.load(path)
+        started = time.time()
+        sim = play(replay)
+        elapsed = time.time() - started
+        status = 'ok' if replay.verify(sim) else 'MISMATCH'
+        print('%s: %s, %d ticks (%.1fs of play) in %.3fs' % (
+            path, status, replay.ticks, sim.time / 1000.0, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,109 @@
+"""Persistent high scores in SQLite.
+
+Every finished game adds one row per player; nothing is rewritten. Rows
+carry the difficulty and the number of players, and an index on
+(difficulty, players, score) serves per-mode top-K queries. Ranks come
+from a per-board count of games for each distinct score, so they stay
+fast over millions of games.
+"""
+import os
+import time
+import pickle
+import sqlite3
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    difficulty TEXT NOT NULL,
+    players INTEGER NOT NULL,
+    played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_board
+    ON scores (difficulty, players, score DESC);
+CREATE TABLE IF NOT EXISTS score_counts (
+    difficulty TEXT NOT NULL,
+    players INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (difficulty, players, score)
+) WITHOUT ROWID;
+'''
+
+
+class ScoreStore(object):
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def add(self, name, score, difficulty, players):
+        """Record one player's result, returns its rank on its board."""
+        self.add_many([(name, score, difficulty, players)])
+        return self.rank(score, difficulty, players)
+
+    def add_many(self, rows):
+        """Bulk insert (name, score, difficulty, players) rows."""
+        now = time.time()
+        rows = [tuple(row) for row in rows]
+        counts = {}
+        for name, score, difficulty, players in rows:
+            key = (difficulty, players, score)
+            counts[key] = counts.get(key, 0) + 1
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO scores (name, score, difficulty, players, played)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                [row + (now,) for row in rows])
+            self.db.executemany(
+                'INSERT OR IGNORE INTO score_counts'
+                ' (difficulty, players, score, games) VALUES (?, ?, ?, 0)',
+                list(counts))
+            self.db.executemany(
+                'UPDATE score_counts SET games = games + ?'
+                ' WHERE difficulty = ? AND players = ? AND score = ?',
+                [(games,) + key for key, games in counts.items()])
+
+    def top(self, k, difficulty, players):
+        """The k best (name, score) pairs on a board, best first."""
+        cursor = self.db.execute(
+            'SELECT name, score FROM scores'
+            ' WHERE difficulty = ? AND players = ?'
+            ' ORDER BY score DESC, id LIMIT ?',
+            (difficulty, players, k))
+        return cursor.fetchall()
+
+    def rank(self, score, difficulty, players):
+        """1-based position score would take on its board."""
+        cursor = self.db.execute(
+            'SELECT TOTAL(games) FROM score_counts'
+            ' WHERE difficulty = ? AND players = ? AND score > ?',
+            (difficulty, players, score))
+        return int(cursor.fetchone()[0]) + 1
+
+    def count(self, difficulty, players):
+        cursor = self.db.execute(
+            'SELECT TOTAL(games) FROM score_counts'
+            ' WHERE difficulty = ? AND players = ?',
+            (difficulty, players))
+        return int(cursor.fetchone()[0])
+
+    def import_legacy(self, path, difficulty, players):
+        """Move a pickled top-10 list from older versions onto a board
+        and rename the old file out of the way."""
+        if not os.path.isfile(path):
+            return
+        legacy_file = open(path, 'rb')
+        try:
+            rows = pickle.load(legacy_file)
+        finally:
+            legacy_file.close()
+        self.add_many((name, score, difficulty, players)
+                      for name, score in rows
+                      if name != 'NOBODY' or score)
+        os.rename(path, path + '.imported')
@@ -0,0 +1,266 @@
+"""Authoritative multiplayer server: one shared arena over TCP.
+
+The server owns an engine.Simulation and steps it at a fixed tick; clients
+only send turns. After every tick that changed something, one delta is
+encoded once and written to every client:
+
+    {"t": "d", "n": tick,
+     "s": [[snake id, [[x, y], ...pushed heads], popped tails], ...],
+     "j": [[snake id, name], ...], "l": [snake id, ...],
+     "sc": [[snake id, score, lives, playing], ...],
+     "f+": [[food id, x, y], ...], "f-": [food id, ...],
+     "fm": [[food id, x, y], ...]}
+
+Keys without changes are left out. Heads are pushed before tails are
+popped, which gives the same body as the server's interleaved order.
+A joining client gets a "welcome" with its snake id and the arena size,
+then a "full" snapshot to apply deltas to.
+
+Client messages are JSON lines too: {"t": "join", "name": ...},
+{"t": "turn", "d": "up"}, {"t": "respawn"} once out of lives, and
+{"t": "full"} for a fresh snapshot. WebSockets would need a third-party
+package, so only plain TCP is served.
+"""
+import sys
+import json
+import asyncio
+import argparse
+
+import engine
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+class Client(object):
+    def __init__(self, writer, snake_id):
+        self.writer = writer
+        self.snake_id = snake_id
+
+    def send(self, data):
+        self.writer.write(data)
+
+
+class GameServer(object):
+    def __init__(self, width=1600, height=1200, bulk=20, maxfood=20,
+                 difficulty=engine.NORMAL, tick=1000.0 / 60, seed=None,
+                 max_buffer=1 << 20):
+        self.sim = engine.Simulation(width, height, bulk, maxfood,
+                                     difficulty, tick, seed)
+        self.max_buffer = max_buffer
+        self.ticks = 0
+        self.clients = set()
+        self.snakes = {}     # id -> snake
+        self.snake_ids = {}  # snake -> id
+        self.food_ids = {}   # food -> id
+        self.food_pos = {}   # id -> (x, y) as last sent
+        self.sent_status = {}
+        self.joined = []
+        self.left = []
+        self.next_id = 1
+
+    def new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def join(self, name):
+        startpos = self.sim.grid.random_free(self.sim.random) or (0, 0)
+        snake = engine.Snake(len(self.snakes) % 2 + 1, startpos,
+                             bulk=self.sim.bulk, name=name)
+        snake.events = []
+        if self.sim.difficulty == engine.HARD:
+            snake.speed = 50
+        self.sim.add_snake(snake)
+        snake_id = self.new_id()
+        self.snakes[snake_id] = snake
+        self.snake_ids[snake] = snake_id
+        self.joined.append([snake_id, name])
+        return snake_id
+
+    def leave(self, snake_id):
+        snake = self.snakes.pop(snake_id)
+        del self.snake_ids[snake]
+        self.sent_status.pop(snake_id, None)
+        self.sim.remove_snake(snake)
+        self.left.append(snake_id)
+
+    def status(self, snake):
+        return [snake.score, snake.lives, snake.playing]
+
+    def snapshot(self):
+        snakes = []
+        for snake_id, snake in self.snakes.items():
+            snakes.append([snake_id, snake.name, [list(c) for c in snake.body]]
+                          + self.status(snake))
+        food = [[food_id, f.x, f.y] for f, food_id in self.food_ids.items()]
+        return {'t': 'full', 'n': self.ticks, 'snakes': snakes, 'food': food}
+
+    def delta(self):
+        """Changes since the previous call, None if there were none."""
+        message = {}
+        moves = []
+        status = []
+        for snake_id, snake in self.snakes.items():
+            if snake.events:
+                pushes = []
+                pops = 0
+                for kind, x, y in snake.events:
+                    if kind == engine.PUSH:
+                        pushes.append([x, y])
+                    else:
+                        pops += 1
+                del snake.events[:]
+                moves.append([snake_id, pushes, pops])
+            current = self.status(snake)
+            if self.sent_status.get(snake_id) != current:
+                self.sent_status[snake_id] = current
+                status.append([snake_id] + current)
+        if moves:
+            message['s'] = moves
+        if status:
+            message['sc'] = status
+        if self.joined:
+            message['j'] = self.joined
+            self.joined = []
+        if self.left:
+            message['l'] = self.left
+            self.left = []
+
+        added = []
+        moved = []
+        alive = set()
+        for f in self.sim.food:
+            food_id = self.food_ids.get(f)
+            if food_id is None:
+                food_id = self.food_ids[f] = self.new_id()
+                added.append([food_id, f.x, f.y])
+            elif self.food_pos[food_id] != (f.x, f.y):
+                moved.append([food_id, f.x, f.y])
+            self.food_pos[food_id] = (f.x, f.y)
+            alive.add(food_id)
+        if len(alive) != len(self.food_ids):
+            gone = [f for f, food_id in self.food_ids.items()
+                    if food_id not in alive]
+            message['f-'] = []
+            for f in gone:
+                food_id = self.food_ids.pop(f)
+                del self.food_pos[food_id]
+                message['f-'].append(food_id)
+        if added:
+            message['f+'] = added
+        if moved:
+            message['fm'] = moved
+
+        if not message:
+            return None
+        message['t'] = 'd'
+        message['n'] = self.ticks
+        return message
+
+    def broadcast(self, data):
+        for client in list(self.clients):
+            transport = client.writer.transport
+            if transport.is_closing() or \
+                    transport.get_write_buffer_size() > self.max_buffer:
+                # too far behind to catch up; it can reconnect
+                self.clients.discard(client)
+                client.writer.close()
+                continue
+            client.send(data)
+
+    def flush(self):
+        message = self.delta()
+        if message is not None:
+            self.broadcast(encode(message))
+
+    def step(self):
+        self.sim.step()
+        self.ticks += 1
+        self.flush()
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.step()
+            next_tick += self.sim.tick / 1000.0
+            delay = next_tick - loop.time()
+            if delay < 0:
+                # running late: don't try to make up the lost ticks
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    async def handle(self, reader, writer):
+        client = None
+        try:
+            message = json.loads(await reader.readline())
+            if message.get('t') != 'join':
+                return
+            # send out pending changes so snapshots match the stream
+            self.flush()
+            snake_id = self.join(str(message.get('name', ''))[:32])
+            client = Client(writer, snake_id)
+            client.send(encode({'t': 'welcome', 'id': snake_id,
+                                'width': self.sim.width,
+                                'height': self.sim.height,
+                                'bulk': self.sim.bulk,
+                                'tick': self.sim.tick}))
+            client.send(encode(self.snapshot()))
+            self.clients.add(client)
+            snake = self.snakes[snake_id]
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                kind = message.get('t')
+                direction = message.get('d')
+                # a list or dict is unhashable: check the type before the lookup
+                if kind == 'turn' and isinstance(direction, str) and \
+                        direction in engine.DIRECTIONS:
+                    snake.turn(direction)
+                elif kind == 'full':
+                    self.flush()
+                    client.send(encode(self.snapshot()))
+                elif kind == 'respawn' and not snake.playing:
+                    snake.full_reset()
+                    if self.sim.difficulty == engine.HARD:
+                        snake.speed = 50
+        except (ConnectionError, ValueError, AttributeError):
+            pass
+        finally:
+            if client is not None:
+                self.clients.discard(client)
+                if client.snake_id in self.snakes:
+                    self.leave(client.snake_id)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run_ticks())
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='SnakeGame server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--maxfood', type=int, default=20)
+    parser.add_argument('--hard', action='store_true')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv[1:])
+    difficulty = engine.HARD if args.hard else engine.NORMAL
+    server = GameServer(args.width, args.height, maxfood=args.maxfood,
+                        difficulty=difficulty, seed=args.seed)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv)
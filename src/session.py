@@ -0,0 +1,289 @@
+"""Saved game sessions in a compact, versioned binary format.
+
+Only game state is written: per snake its settings, score, lives,
+direction, body cells (as packed int16 arrays, so saving and loading
+a long snake is a couple of C-level copies) and queued turns, then the
+food and the game clock. Nothing is read from or written back to the live objects beyond
+plain attribute reads.
+
+Saves go to a temporary file in the same directory that is fsynced and
+then renamed over the old session, so a crash mid-save leaves either the
+old or the new session, never a torn one.
+
+Autosaver writes periodic checkpoints from a background thread: the game
+loop only takes a snapshot (plain values and array copies), packing and
+disk I/O happen on the worker.
+"""
+import os
+import sys
+import time
+import struct
+import tempfile
+import threading
+from array import array
+
+import engine
+from replay import write_string, read_string
+
+
+MAGIC = b'SNKS'
+VERSION = 2
+
+GAME = struct.Struct('<dB')
+SNAKE = struct.Struct('<BhhIIddi?b??hhhhBBBiiiiI')
+FOOD = struct.Struct('<hhidbb?')
+
+
+class SessionError(Exception):
+    pass
+
+
+def pack_array(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_array(data, pos, count, typecode):
+    values = array(typecode)
+    end = pos + count * values.itemsize
+    values.frombytes(bytes(data[pos:end]))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values, end
+
+
+def snapshot(sim):
+    """Copy what a session needs out of sim and its snakes (Players keep
+    their color and controls). Later changes to sim do not affect it."""
+    snakes = []
+    for snake in sim.snakes:
+        color = getattr(snake, 'color', (255, 255, 255))
+        controls = [getattr(snake, key, 0) or 0
+                    for key in ('up', 'down', 'left', 'right')]
+        fields = (snake.number, snake.startpos[0], snake.startpos[1],
+                  snake.initlength, snake.length, snake.speed, snake.elapsed,
+                  snake.score, snake.playing, snake.lives, snake.needs_to_move,
+                  snake.crashed, snake.dir_x, snake.dir_y, snake.x, snake.y,
+                  color[0], color[1], color[2],
+                  controls[0], controls[1], controls[2], controls[3])
+        # the turns only, when they were made means nothing after a load
+        queued = [direction for direction, stamp in snake.queued]
+        snakes.append((fields, snake.name, snake.body.cells(), queued))
+    food = [(f.x, f.y, f.points, f.born, f.dir_x, f.dir_y, f.eaten)
+            for f in sim.food]
+    return sim.difficulty, sim.time, snakes, food
+
+
+def encode(state):
+    """Pack a snapshot() into session bytes."""
+    difficulty, game_time, snakes, food = state
+    buf = bytearray(MAGIC)
+    buf.append(VERSION)
+    write_string(buf, difficulty)
+    buf.extend(GAME.pack(game_time, len(snakes)))
+    for fields, name, (xs, ys, tiles), queued in snakes:
+        buf.extend(SNAKE.pack(*(fields + (len(xs),))))
+        write_string(buf, name)
+        buf.extend(pack_array(xs, 'h'))
+        buf.extend(pack_array(ys, 'h'))
+        buf.extend(pack_array(tiles, 'b'))
+        buf.append(len(queued))
+        for direction in queued:
+            write_string(buf, direction)
+    buf.extend(struct.pack('<I', len(food)))
+    for values in food:
+        buf.extend(FOOD.pack(*values))
+    return bytes(buf)
+
+
+def dumps(sim):
+    """Serialize the state of sim and its snakes."""
+    return encode(snapshot(sim))
+
+
+def loads(data):
+    """Parse a session into a dict of plain values; see restore_snake
+    and restore_food for putting them back into live objects."""
+    data = bytearray(data)
+    if data[:4] != MAGIC:
+        raise SessionError('not a session file')
+    if data[4] != VERSION:
+        raise SessionError('unsupported session version %s' % data[4])
+    pos = 5
+    difficulty, pos = read_string(data, pos)
+    game_time, count = GAME.unpack_from(data, pos)
+    pos += GAME.size
+    snakes = []
+    for i in range(count):
+        fields = SNAKE.unpack_from(data, pos)
+        pos += SNAKE.size
+        name, pos = read_string(data, pos)
+        size = fields[-1]
+        xs, pos = unpack_array(data, pos, size, 'h')
+        ys, pos = unpack_array(data, pos, size, 'h')
+        tiles, pos = unpack_array(data, pos, size, 'b')
+        queued = []
+        turns, pos = data[pos], pos + 1
+        for j in range(turns):
+            direction, pos = read_string(data, pos)
+            if direction not in engine.DIRECTIONS:
+                raise SessionError('unknown direction %r' % direction)
+            queued.append(direction)
+        snakes.append({
+            'number': fields[0], 'name': name,
+            'startpos': (fields[1], fields[2]), 'initlength': fields[3],
+            'length': fields[4], 'speed': fields[5], 'elapsed': fields[6],
+            'score': fields[7], 'playing': fields[8], 'lives': fields[9],
+            'needs_to_move': fields[10], 'crashed': fields[11],
+            'dir_x': fields[12], 'dir_y': fields[13],
+            'x': fields[14], 'y': fields[15],
+            'color': tuple(fields[16:19]), 'controls': tuple(fields[19:23]),
+            'body': (xs, ys, tiles), 'queued': queued,
+        })
+    food_count = struct.unpack_from('<I', data, pos)[0]
+    pos += 4
+    food = []
+    for i in range(food_count):
+        food.append(FOOD.unpack_from(data, pos))
+        pos += FOOD.size
+    return {'difficulty': difficulty, 'time': game_time, 'snakes': snakes,
+            'food': food}
+
+
+SNAKE_FIELDS = ['length', 'speed', 'elapsed', 'score', 'playing', 'lives',
+                'needs_to_move', 'crashed', 'dir_x', 'dir_y', 'x', 'y']
+
+
+def restore_snake(snake, state):
+    """Copy a loaded snake's state onto snake before it joins a
+    Simulation (which indexes the restored body)."""
+    for key in SNAKE_FIELDS:
+        setattr(snake, key, state[key])
+    snake.body.load(*state['body'])
+    # no stamps: input_latency is not sampled for turns from a save
+    snake.queued = [(direction, None) for direction in state['queued']]
+
+
+def restore_food(state, bulk=20):
+    x, y, points, born, dir_x, dir_y, eaten = state
+    food = engine.Food(x, y, bulk, points, born)
+    food.dir_x = dir_x
+    food.dir_y = dir_y
+    food.eaten = eaten
+    return food
+
+
+def is_session(path):
+    """True if path holds a session this version can load."""
+    try:
+        session_file = open(path, 'rb')
+    except (IOError, OSError):
+        return False
+    try:
+        header = bytearray(session_file.read(5))
+    finally:
+        session_file.close()
+    return header[:4] == MAGIC and header[4:] == bytearray([VERSION])
+
+
+def save(path, sim):
+    """Atomically replace path with the session of sim."""
+    write(path, dumps(sim))
+
+
+def write(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.session-', dir=directory)
+    try:
+        tmp_file = os.fdopen(fd, 'wb')
+        try:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        finally:
+            tmp_file.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load(path):
+    session_file = open(path, 'rb')
+    try:
+        return loads(session_file.read())
+    finally:
+        session_file.close()
+
+
+class Autosaver(object):
+    """Periodic session checkpoints written by a background thread.
+
+    checkpoint() takes a snapshot on the calling thread and hands it to
+    the worker. If the worker is still busy, a snapshot it has not started
+    on is replaced by the newer one, so a slow disk costs checkpoints,
+    never frames. All writes and removals go through the one worker, in
+    order.
+    """
+
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval # seconds
+        self.last = time.monotonic()
+        self.pending = None
+        self.busy = False
+        self.error = None
+        self.thread = None
+        self.cond = threading.Condition()
+
+    def due(self):
+        return self.interval > 0 and \
+            time.monotonic() - self.last >= self.interval
+
+    def checkpoint(self, sim):
+        self.last = time.monotonic()
+        self.submit(('save', snapshot(sim)))
+
+    def discard(self):
+        """Remove the session file, after any checkpoint in flight."""
+        self.submit(('remove', None))
+
+    def submit(self, job):
+        with self.cond:
+            self.pending = job
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='autosave')
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify_all()
+
+    def wait(self):
+        """Block until everything submitted so far is on disk."""
+        with self.cond:
+            while self.pending is not None or self.busy:
+                self.cond.wait()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                kind, state = self.pending
+                self.pending = None
+                self.busy = True
+            try:
+                if kind == 'save':
+                    write(self.path, encode(state))
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+            except (IOError, OSError) as error:
+                # keep playing; the next checkpoint tries again
+                self.error = error
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
@@ -1,9 +1,15 @@
 import pygame
-pygame.init()
 import random
 import os
 import sys
-import pickle
+import time
+
+import engine
+import autopilot
+import replay
+import session
+import scores
+import profiler
 
 
 #colors
@@ -14,374 +20,437 @@ GREEN = 0, 255, 0
 BLUE = 0, 0, 255
 
 SESSION_FILE_NAME = 'session.bf'
-SCORE_FILE_NAME = 'score.bf'
+SCORE_FILE_NAME = 'score.bf' #pre-SQLite top 10, imported once
+SCORE_DB_NAME = 'scores.db'
+REPLAY_DIR = 'replays'
+PROFILE_FILE_NAME = 'profile.json'
 BACKGROUND = 'img/grass.jpg'
 SNAKES = 'img/snakes.png'
 BUGS = 'img/bugs.png'
 
+#sprite sheet columns, see BaseSnake.sprite_rects
+SNAKE_TILES = engine.TILES
 
-class Food(object):
-    def __init__(self, surface, bulk=20):
-        self.surface = surface
-        self.bulk = bulk
-        self.color = GREEN
-        self.points = 0
-        self.eaten = False
-        self.dir_x = -1
-        self.dir_y = 1
-        self.animation_pos = 0
-        self.animation_direction = 1
-        self.animation_speed = 160 #ms
-        self.time = 0
-        self.rect = self.build_rect()
-        self.set_points_worth()
-
-    def build_rect(self):
-        x = random.randrange(self.bulk, game.gamewidth - self.bulk)
-        y = random.randrange(self.bulk, game.gameheight - self.bulk)
-        return pygame.Rect(x, y, self.bulk, self.bulk)
-
-    def set_points_worth(self):
-        x_cartesian = (self.rect.x - (game.gamewidth / 2)) / 10
-        y_cartesian = (self.rect.y - (game.gameheight / 2)) / 10
-
-        def make_positive(i):
-            return i if i >=0 else i * -1
-        
-        x = make_positive(x_cartesian)
-        y = make_positive(y_cartesian)
-        self.points = (x + y) / 2
-
-    def being_eaten(self, rect):
-        return self.rect.colliderect(rect)
-
-    def has_been_eaten(self):
-        self.eaten = True
 
-    def nutritional_value(self):
-        return self.points / 10
+class asset(object):
+    """MainApp class attribute built by load(cls) on first access.
 
-    def draw(self):
-        pos = self.animation_pos * self.bulk
-        self.surface.blit(game.bugs.subsurface(pos, 0, self.bulk, self.bulk), self.rect)
-        curr_time = pygame.time.get_ticks()
-        if self.time == 0:
-            self.time = curr_time
-        time_passed = curr_time - self.time
-        if not time_passed > self.animation_speed:
-            return
-        else:
-            self.time = curr_time
-        if pos + self.bulk >= game.bugs.get_width():
-            self.animation_direction = -1
-        elif self.animation_pos == 0:
-            self.animation_direction = 1
-        self.animation_pos += self.animation_direction
+    The result replaces the descriptor on the class, so it is loaded once
+    and shared by every instance afterwards.
+    """
 
-    def move(self):
-        def rect_in_players():
-            for player in game.players:
-                if self.rect.collidelist(player.body) != -1:
-                    return True
+    def __init__(self, load):
+        self.load = load
+        self.name = load.__name__
 
-        if bool(random.randint(0, 1)):
-            self.dir_x = random.randint(-1, 1)
-            self.dir_y = random.randint(-1, 1)
+    def __get__(self, obj, cls):
+        value = self.load(cls)
+        setattr(cls, self.name, value)
+        return value
 
-        self.rect.x += self.dir_x
-        self.rect.y += self.dir_y
 
-        if not game.gamearea.contains(self.rect) or rect_in_players():
-            self.rect.x += self.dir_x * -1
-            self.rect.y += self.dir_y * -1
-
-class BaseSnake(object):
+class BaseSnake(engine.Snake):
+    __slots__ = ('surface', 'color')
+    #shared by every snake with the same number and bulk
+    rect_cache = {}
+    tile_cache = {}
 
     def __init__(self, surface, startpos, color, initlength=10, bulk=20):
+        engine.Snake.__init__(self, self.number, startpos, initlength, bulk,
+                              self.name)
         self.surface = surface
-        self.startpos = startpos
-        self.initlength = initlength
-        self.length = initlength
-        self.body = []
-        self.x, self.y = startpos
-        self.dir_x = 0
-        self.dir_y = -1 * bulk
-        self.crashed = False
-        self.score = 0
-        self.bulk = bulk
         self.color = color
-        self.speed = 160 #ms
-        self.time = 0
-        self.cycles = 0
-        self.needs_to_move = False
-        self.define_body_elements()
-
-    def define_body_elements(self):
-        pos = (self.number * self.bulk) - self.bulk
-        self.head_ud = pygame.Rect(0, pos, self.bulk, self.bulk)
-        self.head_du = pygame.Rect(1 * self.bulk, pos, self.bulk, self.bulk)
-        self.head_lr = pygame.Rect(2 * self.bulk, pos, self.bulk, self.bulk)
-        self.head_rl = pygame.Rect(3 * self.bulk, pos, self.bulk, self.bulk)
-        
-        self.body_horiz = pygame.Rect(4 * self.bulk, pos, self.bulk, self.bulk)
-        self.body_vert = pygame.Rect(5 * self.bulk, pos, self.bulk, self.bulk)
-
-        self.flex_rddr = pygame.Rect(6 * self.bulk, pos, self.bulk, self.bulk)
-        self.flex_luul = pygame.Rect(7 * self.bulk, pos, self.bulk, self.bulk)
-        self.flex_ruur = pygame.Rect(8 * self.bulk, pos, self.bulk, self.bulk)
-        self.flex_lddl = pygame.Rect(9 * self.bulk, pos, self.bulk, self.bulk)
-
-        self.tail_ud = pygame.Rect(10 * self.bulk, pos, self.bulk, self.bulk)
-        self.tail_du = pygame.Rect(11 * self.bulk, pos, self.bulk, self.bulk)
-        self.tail_lr = pygame.Rect(12 * self.bulk, pos, self.bulk, self.bulk)
-        self.tail_rl = pygame.Rect(13 * self.bulk, pos, self.bulk, self.bulk)
-
-    def move(self):
-        curr_time = pygame.time.get_ticks()
-        if self.time == 0:
-            self.time = curr_time
-        time_passed = curr_time - self.time
-        if not time_passed > self.speed:
-            return
-        else:
-            self.cycles = time_passed / self.speed
-            self.time = curr_time
-
-        for i in range(int(self.cycles)):
-            self.x += self.dir_x
-            self.y += self.dir_y
-            body_elem = pygame.Rect(self.x, self.y, self.bulk, self.bulk)
-            self.body.insert(0, body_elem)
-            if self.length != 0 and len(self.body) > self.length:
-                self.body.pop()
 
-        self.crashed = self.check_crash()
-        self.needs_to_move = False
-
-    def draw(self):
-        if not self.body:
+    @classmethod
+    def sprite_rects(cls, number, bulk):
+        """Sprite sheet rects of snake number's row, in SNAKE_TILES order."""
+        key = (number, bulk)
+        rects = cls.rect_cache.get(key)
+        if rects is None:
+            pos = (number * bulk) - bulk
+            rects = [pygame.Rect(i * bulk, pos, bulk, bulk)
+                     for i in range(len(SNAKE_TILES))]
+            cls.rect_cache[key] = rects
+        return rects
+
+    def get_tiles(self):
+        key = (self.number, self.bulk)
+        tiles = self.tile_cache.get(key)
+        if tiles is None:
+            tiles = []
+            for rect in self.sprite_rects(self.number, self.bulk):
+                tiles.append(MainApp.snakes.subsurface(rect).copy())
+            self.tile_cache[key] = tiles
+        return tiles
+
+    def draw(self, progress=0):
+        """progress (0 to 1) is how far the snake is towards its next
+        move; the head and tail are drawn that far along their way."""
+        tiles = self.get_tiles()
+        blit = self.surface.blit
+        body = self.body
+        if not progress or len(body) < 3:
+            for x, y, tile in body.segments():
+                if tile != engine.NO_TILE:
+                    blit(tiles[tile], (x, y))
             return
-        body_length = len(self.body)
-        for i in range(body_length):
-            if i != 0:
-                prev = self.body[i - 1]
+
+        last = len(body) - 1
+        shrinking = self.length and len(body) >= self.length
+        for i, (x, y, tile) in enumerate(body.segments()):
+            if i == 0:
+                # the head leaves behind the piece its cell will become
+                ahead = (x + self.dir_x, y + self.dir_y)
+                neck = engine.classify(ahead, (x, y), body[1])
+                head = engine.classify(None, ahead, (x, y))
+                if neck != engine.NO_TILE:
+                    blit(tiles[neck], (x, y))
+                if head != engine.NO_TILE:
+                    blit(tiles[head], (int(x + self.dir_x * progress),
+                                       int(y + self.dir_y * progress)))
+            elif tile == engine.NO_TILE:
+                continue
+            elif i == last and shrinking:
+                px, py = body[last - 1]
+                blit(tiles[tile], (int(x + (px - x) * progress),
+                                   int(y + (py - y) * progress)))
             else:
-                prev = None
-            me = self.body[i]
-            try:
-                next = self.body[i + 1]
-            except IndexError:
-                next = None
-
-            if not prev and next:
-                if me.x < next.x:
-                    img = game.snakes.subsurface(self.head_lr)
-                elif me.x > next.x:
-                    img = game.snakes.subsurface(self.head_rl)
-                elif me.y < next.y:
-                    img = game.snakes.subsurface(self.head_ud)
-                elif me.y > next.y:
-                    img = game.snakes.subsurface(self.head_du)
-
-                self.surface.blit(img, self.body[i])
-
-
-            if next and prev:
-                if me.x < next.x and me.y < prev.y or \
-                    me.x < prev.x and me.y < next.y:
-                    img = game.snakes.subsurface(self.flex_rddr)
-
-                elif me.x < next.x and me.y > prev.y or \
-                    me.x < prev.x and me.y > next.y:
-                    img = game.snakes.subsurface(self.flex_ruur)
-
-                elif me.x > next.x and me.y > prev.y or \
-                    me.x > prev.x and me.y > next.y:
-                    img = game.snakes.subsurface(self.flex_luul)
-
-                elif me.x > next.x and me.y < prev.y or \
-                    me.x > prev.x and me.y < next.y:
-                    img = game.snakes.subsurface(self.flex_lddl)
-
-                elif me.x == prev.x == next.x:
-                    img = game.snakes.subsurface(self.body_vert)
-
-                elif me.y == prev.y == next.y:
-                    img = game.snakes.subsurface(self.body_horiz)
-
-                self.surface.blit(img, self.body[i])
-
-            if not next and prev:
-                if me.x > prev.x:
-                    img = game.snakes.subsurface(self.tail_lr)
-                elif me.x < prev.x:
-                    img = game.snakes.subsurface(self.tail_rl)
-                elif me.y > prev.y:
-                    img = game.snakes.subsurface(self.tail_ud)
-                elif me.y < prev.y:
-                    img = game.snakes.subsurface(self.tail_du)
-                    
-                self.surface.blit(img, self.body[i])
-
-    def check_crash(self):
-        head = self.body[0]
-        gamearea = game.gamearea
-        if not gamearea.contains(head):
-            return True
-        for player in game.players:
-            pbody = player.body[1:]
-            if head.collidelist(pbody) != -1:
-                return True
-        return False
+                blit(tiles[tile], (x, y))
 
-    def check_ate(self, food):
-        if not len(self.body):
-            return
-        for f in food:
-            if f.being_eaten(self.body[0]):
-                self.score += f.points
-                self.speed -= 0.1
-                self.length += f.nutritional_value()
-                f.has_been_eaten()
+    def draw_segment(self, i, tiles):
+        tile = self.body.tile(i)
+        if tile != engine.NO_TILE:
+            self.surface.blit(tiles[tile], self.body[i])
 
 
 class Player(BaseSnake):
+    __slots__ = ('up', 'down', 'left', 'right', 'controller')
+
     def __init__(self, name, controls, number, *args):
         self.name = name
         self.number = number
-        self.lives = 3
-        self.playing = True
         self.up, self.down, self.left, self.right = controls
+        self.controller = None
         BaseSnake.__init__(self, *args)
 
-    def reset(self):
-        self.body = []
-        self.x, self.y = self.startpos
-        self.dir_x, self.dir_y = 0, -1 * self.bulk
-        self.score = 0
-        self.crashed = False
-        self.playing = True
-    
-    def full_reset(self):
-        self.reset()
-        self.length = self.initlength
-        self.lives = 3
-        self.time = 0
-
-    def handle_crash(self):
-        self.lives -= 1
-        if self.lives > 0:
-            score = self.score
-            self.reset()
-            self.score = score
-        else:
-            self.playing = False
-
     def handle_key(self, key):
         if key == self.up:
-            if self.dir_y in (1, self.bulk) or self.needs_to_move:
-                return
-            self.dir_x = 0
-            self.dir_y = -1 * self.bulk
-            self.needs_to_move = True
+            self.turn(engine.UP)
         elif key == self.down:
-            if self.dir_y in (-1, self.bulk * -1) or self.needs_to_move:
-                return
-            self.dir_x = 0
-            self.dir_y = 1 * self.bulk
-            self.needs_to_move = True
+            self.turn(engine.DOWN)
         elif key == self.left:
-            if self.dir_x in (1, self.bulk) or self.needs_to_move:
-                return
-            self.dir_x = -1 * self.bulk
-            self.dir_y = 0
-            self.needs_to_move = True
+            self.turn(engine.LEFT)
         elif key == self.right:
-            if self.dir_x in (-1, self.bulk * -1) or self.needs_to_move:
-                return
-            self.dir_x = 1 * self.bulk
-            self.dir_y = 0
-            self.needs_to_move = True
+            self.turn(engine.RIGHT)
+
+
+class AutoPlayer(Player):
+    """A computer player, steered by an autopilot.Autopilot."""
+
+    __slots__ = ()
+
+    def __init__(self, name, number, *args):
+        Player.__init__(self, name, (None, None, None, None), number, *args)
+        self.controller = autopilot.Autopilot()
 
 class MainApp(object):
     width = 800
     height = 600
-    screen = pygame.display.set_mode((width, height))
-    clock = pygame.time.Clock()
     bgcolor = BLACK
     running = False
+    scene = None
     statusarea = 25
     maxfood = 1
     players = []
-    food = []
-    framerate = 60
+    framerate = 60 #render cap, 0 for none
+    max_catch_up = 5 #simulation ticks per frame
+    lag = 0 #ms of game time not simulated yet
+    smooth = True
     gamewidth = width
     gameheight = height - statusarea
-    gamearea = None
-    difficulty = 'normal'
-    font = pygame.font.Font('freesansbold.ttf', 18)
-    background = pygame.image.load(BACKGROUND).convert()
-    snakes = pygame.image.load(SNAKES).convert()
-    bugs = pygame.image.load(BUGS).convert()
+    difficulty = engine.NORMAL
+    bulk = 20
+    animation_speed = 160 #ms
+    sim = None
+    seed = None
+    record_replays = False
+    autosave_interval = 5 #s, 0 to only save on exit
+    attract_delay = 30000 #ms idle in the menu before a demo game, 0 for never
+    autosaver = None
+    profiler = None
+    profile_file = None
+    show_profile = False
+    profile_surface = None
+    score_store = None
+    score_boards = [(engine.NORMAL, 1), (engine.NORMAL, 2),
+                    (engine.HARD, 1), (engine.HARD, 2)]
+    ranks = []
+    bug_frames = {}
+    dirty_rects = False
+    full_redraw = True
+    drawn_food = {}
+    drawn_status = None
+    drawn_playing = None
+    backdrop = None
+    text_cache = {}
+    text_cache_size = 256
+    status_key = None
+    status_surfaces = []
+
+    @asset
+    def screen(cls):
+        screen = pygame.display.set_mode((cls.width, cls.height))
+        pygame.display.set_caption('SnakeGame')
+        return screen
+
+    @asset
+    def clock(cls):
+        return pygame.time.Clock()
+
+    @asset
+    def font(cls):
+        return pygame.font.Font('freesansbold.ttf', 18)
+
+    @asset
+    def background(cls):
+        cls.screen
+        return pygame.image.load(BACKGROUND).convert()
+
+    @asset
+    def snakes(cls):
+        cls.screen
+        snakes = pygame.image.load(SNAKES).convert()
+        snakes.set_colorkey((255, 255, 255))
+        return snakes
+
+    @asset
+    def bugs(cls):
+        cls.screen
+        bugs = pygame.image.load(BUGS).convert()
+        bugs.set_colorkey((255, 255, 255))
+        return bugs
 
     def __init__(self):
-        pygame.display.set_caption('SnakeGame')
-        self.snakes.set_colorkey((255, 255, 255))
-        self.bugs.set_colorkey((255, 255, 255))
+        pygame.init()
 
+    @classmethod
+    def offscreen(cls):
+        """Draw into a plain surface instead of a window, as export.py
+        does. The display still gets a token mode for image conversion."""
+        pygame.display.set_mode((1, 1))
+        cls.screen = pygame.Surface((cls.width, cls.height))
+        return cls.screen
 
     def add_player(self, player):
         self.players.append(player)
 
-    def clean_food(self):
-        self.food = [f for f in self.food if not f.eaten]
-        if len(self.food) < self.maxfood:
-            for i in range(len(self.food), self.maxfood):
-                self.food.append(Food(self.screen))
-
-    def draw_food(self):
-        for f in self.food:
-            f.draw()
-            if self.difficulty == 'hard':
-                f.move()
+    def new_simulation(self):
+        self.seed = random.getrandbits(32)
+        self.sim = engine.Simulation(self.gamewidth, self.gameheight,
+                                     self.bulk, self.maxfood, self.difficulty,
+                                     seed=self.seed)
+        for player in self.players:
+            self.sim.add_snake(player)
+
+    def get_bug_frames(self):
+        frames = self.bug_frames.get(self.bulk)
+        if frames is None:
+            frames = []
+            for pos in range(0, self.bugs.get_width() - self.bulk + 1, self.bulk):
+                frame = self.bugs.subsurface(pos, 0, self.bulk, self.bulk)
+                frames.append(frame.copy())
+            self.bug_frames[self.bulk] = frames
+        return frames
+
+    def food_frames(self):
+        """(x, y, animation frame index) of every bug, in draw order."""
+        period = 2 * (len(self.get_bug_frames()) - 1)
+        count = period // 2 + 1
+        now = self.sim.time
+        speed = self.animation_speed
+        # straight from the swarm's arrays, in the order of sim.food
+        swarm = self.sim.swarm
+        n = len(swarm)
+        states = []
+        for x, y, born in zip(swarm.xs[:n], swarm.ys[:n], swarm.borns[:n]):
+            pos = int((now - born) // speed) % period
+            if pos >= count:
+                pos = period - pos
+            states.append((x, y, pos))
+        return states
+
+    def food_states(self, frames):
+        """food_frames() as (slot, x, y, frame index) by food, to tell
+        which bugs draw_dirty has to draw again."""
+        return dict(zip(self.sim.food,
+                        [(slot,) + state for slot, state in enumerate(frames)]))
+
+    def draw_food(self, states=None):
+        frames = self.get_bug_frames()
+        if states is None:
+            states = self.food_frames()
+        self.screen.blits([(frames[pos], (x, y)) for x, y, pos in states],
+                          False)
 
     def draw_game_area(self):
-        rect = pygame.draw.rect(self.screen, WHITE, (0, 0, self.gamewidth, self.gameheight), 1)
-        self.gamearea = rect
-
-    def draw_status_area(self):
-        drawn_players = []
-        textxpos = 0
+        pygame.draw.rect(self.screen, WHITE, (0, 0, self.gamewidth, self.gameheight), 1)
+
+    def render_text(self, text, color):
+        key = (text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= self.text_cache_size:
+                self.text_cache.clear()
+            surface = self.font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+
+    def status_texts(self):
+        texts = []
         for player in self.players:
             lives = player.lives or 'GAME OVER'
             playerscore = "%s(%s): %sp" % (player.name, lives, player.score)
-            playerstatus = self.font.render(playerscore, True, player.color)
-            if drawn_players:
-                textxpos += drawn_players[-1].get_size()[0] + 10
+            texts.append((playerscore, player.color))
+        return texts
+
+    def get_status_surfaces(self):
+        # only re-render when a name, score or lives count changed
+        key = [(p.name, p.lives, p.score, p.color) for p in self.players]
+        if key != self.status_key:
+            self.status_surfaces = []
+            textxpos = 0
+            for playerscore, color in self.status_texts():
+                playerstatus = self.render_text(playerscore, color)
+                self.status_surfaces.append((playerstatus, textxpos))
+                textxpos += playerstatus.get_size()[0] + 10
+            self.status_key = key
+        return self.status_surfaces
+
+    def draw_status_area(self):
+        for playerstatus, textxpos in self.get_status_surfaces():
             self.screen.blit(playerstatus, (textxpos, self.gameheight + 5))
-            drawn_players.append(playerstatus)
 
-    def run(self):
+    def switch(self, scene):
+        """Make scene the current screen; None ends run()."""
+        self.scene = scene
+        if scene is not None:
+            scene.enter()
+
+    def quit(self):
+        self.switch(None)
+        if self.autosaver is not None:
+            self.autosaver.wait()
+
+    def run(self, scene=None):
+        """The main loop. Screens hand over to each other through switch()
+        instead of calling each other, so the stack stays flat however
+        many games are played."""
+        self.switch(scene or Menu(self))
+        while self.scene is not None:
+            self.scene.frame(pygame.event.get())
+
+    def start_positions(self):
+        return [(self.gamewidth//2, self.gameheight//2),
+                (self.gamewidth//3, self.gameheight//3)]
+
+    def new_game(self):
+        self.new_simulation()
+        self.sim.set_difficulty(self.difficulty)
+        self.start_recording()
+        self.switch(Game(self))
+
+    def new_demo(self):
+        self.demo_simulation()
+        self.switch(Demo(self))
+
+    def demo_simulation(self):
+        """A new game between two computer players."""
         self.players = []
-        self.food = []
-        p1_controls = pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT
-        p2_controls = pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d
-        player1 = Player('Player 1', p1_controls, 1, self.screen,
-                         (self.gamewidth/2, self.gameheight/2), WHITE, 10)
-        player2 = Player('Player 2', p2_controls, 2, self.screen,
-                         (self.gamewidth/3, self.gameheight/3), RED, 10)
-
+        for number, (startpos, color) in enumerate(
+                zip(self.start_positions(), [WHITE, RED])):
+            self.add_player(AutoPlayer('Computer %s' % (number + 1),
+                                       number + 1, self.screen, startpos,
+                                       color, 10))
+        self.new_simulation()
+        self.sim.set_difficulty(self.difficulty)
+
+    def computer_turns(self):
+        """Actions for the next sim.step from computer players, None
+        when there are none."""
+        actions = None
+        for i, player in enumerate(self.players):
+            if player.controller is not None and player.playing:
+                if actions is None:
+                    actions = [None] * len(self.players)
+                actions[i] = player.controller(self.sim, player)
+        return actions
+
+    def leave_game(self):
+        """Stop playing but keep the game for the menu's continue option."""
+        self.running = False
+        self.finish_recording()
+        self.save_profile()
+        self.save_game_status()
+
+    def game_over(self):
+        self.running = False
+        self.finish_recording()
+        self.save_profile()
+        self.save_scores()
+        # nothing left to continue
+        self.get_autosaver().discard()
+        self.switch(PlayAgain(self))
+
+    def start_recording(self):
+        if self.record_replays:
+            self.sim.recorder = replay.Recorder(self.sim, self.seed)
+
+    def finish_recording(self):
+        recorder = self.sim.recorder
+        if recorder is None:
+            return
+        self.sim.recorder = None
+        if not os.path.isdir(REPLAY_DIR):
+            os.makedirs(REPLAY_DIR)
+        name = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(REPLAY_DIR, name + '.snr')
+        number = 1
+        # games that finish within the same second get -2, -3, ...
+        while os.path.exists(path):
+            number += 1
+            path = os.path.join(REPLAY_DIR, '%s-%d.snr' % (name, number))
+        recorder.save(self.sim, path)
+
+    def play_replay(self, path):
+        self.run(Playback(self, self.load_replay(path)))
+
+    def load_replay(self, path):
+        """Set up the players and simulation of a recorded game; returns
+        the Replay to step them with."""
+        recorded = replay.Replay.load(path)
+        colors = [WHITE, RED]
+        self.players = []
+        for number, name, startpos, initlength in recorded.players:
+            self.add_player(Player(name, (None, None, None, None), number,
+                                   self.screen, startpos,
+                                   colors[(number - 1) % len(colors)],
+                                   initlength))
+        self.sim = recorded.simulation(self.players)
+        return recorded
+
+    def draw_menu(self):
         self.screen.fill(BLACK)
-        questiontext = [self.font.render('Press 1 for singleplayer', True, GREEN),
-                        self.font.render('Press 2 for 2-player mode.', True, GREEN),
-                        self.font.render('Player 1 controls: directional keys;', True, BLUE),
-                        self.font.render('Player 2 controls: WSAD keys.', True, BLUE),
-                        self.font.render('ESC = exit game', True, GREEN),
-                        self.font.render('F1 = view high scores', True, GREEN)]
+        questiontext = [self.render_text('Press 1 for singleplayer', GREEN),
+                        self.render_text('Press 2 for 2-player mode.', GREEN),
+                        self.render_text('Press 3 to play against the computer.', GREEN),
+                        self.render_text('Player 1 controls: directional keys;', BLUE),
+                        self.render_text('Player 2 controls: WSAD keys.', BLUE),
+                        self.render_text('ESC = exit game', GREEN),
+                        self.render_text('F1 = view high scores', GREEN)]
 
         if self.game_status_is_saved():
             text = 'Press c to continue previous game'
-            questiontext.insert(-2, self.font.render(text, True, RED))
+            questiontext.insert(-2, self.render_text(text, RED))
         
         textposx = self.width / 3
         textposy = self.height / 4
@@ -391,186 +460,255 @@ class MainApp(object):
             textposy += question.get_size()[1] + 5
         pygame.display.flip()
 
-        selection_done = False
-        while not selection_done:
-            self.clock.tick(self.framerate)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit(1)
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_1:
-                        self.add_player(player1)
-                        selection_done = True
-                    elif event.key == pygame.K_2:
-                        self.add_player(player1)
-                        self.add_player(player2)
-                        selection_done = True
-                    elif self.game_status_is_saved() and event.key == pygame.K_c:
-                        self.load_game_status()
-                        return self.startgame(pause=True)
-                    elif event.key == pygame.K_F1:
-                        return self.score_page()
-                    elif event.key == pygame.K_ESCAPE:
-                        sys.exit(1)
-        self.player_names_screen()
-        self.select_difficulty_screen()
-        self.startgame()
-
     def game_status_is_saved(self):
-        return os.path.isfile(SESSION_FILE_NAME)
+        return session.is_session(SESSION_FILE_NAME)
     
-    def save_game_status(self):
-        data = {'players': [], 'food': [], 'game': {}}
-        for player in self.players:
-            pdata = player.__dict__
-            for key in ['surface', 'time']:
-                del pdata[key]
-            data['players'].append(pdata)
-        
-        for food in self.food:
-            fdata = food.__dict__
-            for key in ['surface', 'time']:
-                del fdata[key]
-            data['food'].append(fdata)
+    def get_autosaver(self):
+        if self.autosaver is None:
+            self.autosaver = session.Autosaver(SESSION_FILE_NAME,
+                                               self.autosave_interval)
+        return self.autosaver
 
-        data['game']['difficulty'] = game.difficulty
+    def autosave(self):
+        autosaver = self.get_autosaver()
+        if autosaver.due():
+            autosaver.checkpoint(self.sim)
 
-        session_file = open(SESSION_FILE_NAME, 'wb')
-        pickle.dump(data, session_file)
+    def save_game_status(self):
+        # same queue as the checkpoints, so none of them lands after this
+        autosaver = self.get_autosaver()
+        autosaver.checkpoint(self.sim)
+        autosaver.wait()
     
     def load_game_status(self):
-        session_file = open(SESSION_FILE_NAME, 'rb')
-        data = pickle.load(session_file)
+        data = session.load(SESSION_FILE_NAME)
         self.players = []
-        for player in data['players']:
-            controls = player['up'], player['down'], player['left'], player['right']
-            pobj = Player(player['name'], controls, player['number'], self.screen, player['startpos'],
-                          player['color'], player['initlength'])
-            for key, value in player.items():
-                setattr(pobj, key, value)
+        for state in data['snakes']:
+            args = (self.screen, state['startpos'], state['color'],
+                    state['initlength'])
+            if any(state['controls']):
+                pobj = Player(state['name'], state['controls'],
+                              state['number'], *args)
+            else:
+                # saved without keys: a computer player
+                pobj = AutoPlayer(state['name'], state['number'], *args)
+            session.restore_snake(pobj, state)
             self.add_player(pobj)
 
-        self.food = []
-        for food in data['food']:
-            fobj = Food(self.screen)
-            for key, value in food.items():
-                setattr(fobj, key, value)
-            self.food.append(fobj)
-        
-        game.difficulty = data['game']['difficulty']
+        self.difficulty = data['difficulty']
+        self.new_simulation()
+        self.sim.time = data['time']
+        for state in data['food']:
+            self.sim.add_food(session.restore_food(state, self.bulk))
+        self.sim.food_eaten = True
 
     def draw_players(self):
+        # dirty rects only repaint whole cells, so no in-between positions
+        smooth = self.smooth and not self.dirty_rects
         for player in self.players:
             if not player.playing:
                 continue
-            player.draw()
-            player.check_ate(self.food)
-            player.move()
-            if player.crashed:
-                player.handle_crash()
-
-        if not [player for player in self.players if player.playing]:
-            self.running = False
-
-    def pause(self):
-        paused = True
-        text = self.font.render('PAUSED - press p to resume', True, GREEN)
+            if smooth:
+                player.draw(min(1.0, (player.elapsed + self.lag) / player.speed))
+            else:
+                player.draw()
+
+    def mark(self, phase):
+        if self.profiler is not None:
+            self.profiler.mark(phase)
+
+    def draw_frame(self):
+        self.screen.blit(self.background, (0, 0))
+
+        self.draw_game_area()
+        self.mark('background')
+        self.draw_status_area()
+        self.mark('status')
+        self.draw_players()
+        self.mark('players')
+        self.draw_food()
+        self.mark('food')
+        if self.show_profile:
+            self.draw_profile()
+
+        pygame.display.flip()
+        self.mark('flip')
+
+        if self.dirty_rects:
+            for player in self.players:
+                player.events = []
+            self.drawn_food = self.food_states(self.food_frames())
+            self.drawn_status = self.get_status_surfaces()
+            self.drawn_playing = [player.playing for player in self.players]
+            self.full_redraw = False
+
+    def get_backdrop(self):
+        # background with the game area border, restored under dirty rects
+        if self.backdrop is None:
+            self.backdrop = self.background.copy()
+            pygame.draw.rect(self.backdrop, WHITE, (0, 0, self.gamewidth, self.gameheight), 1)
+        return self.backdrop
+
+    def draw_dirty(self):
+        if [player.playing for player in self.players] != self.drawn_playing:
+            return self.draw_frame()
+
+        bulk = self.bulk
+        # only bugs that moved, changed animation frame or slot are erased
+        # and drawn again; the rest are still on screen as they were
+        food = self.food_frames()
+        states = self.food_states(food)
+        drawn = self.drawn_food
+        vacated = [pygame.Rect(x, y, bulk, bulk)
+                   for f, (slot, x, y, pos) in drawn.items()
+                   if states.get(f) != (slot, x, y, pos)]
+        redraw = []
+        for player in self.players:
+            if not player.events:
+                continue
+            pushes = 0
+            for kind, x, y in player.events:
+                if kind == engine.PUSH:
+                    pushes += 1
+                else:
+                    vacated.append(pygame.Rect(x, y, bulk, bulk))
+            del player.events[:]
+            length = len(player.body)
+            if length:
+                # new heads, the old head behind them and the tail
+                indices = set(range(min(pushes + 1, length)))
+                indices.add(length - 1)
+                redraw.extend((player, i) for i in indices)
+
+        dirty = vacated + [pygame.Rect(player.body[i], (bulk, bulk))
+                           for player, i in redraw]
+        backdrop = self.get_backdrop()
+        for rect in dirty:
+            self.screen.blit(backdrop, rect, rect)
+
+        # something else shares an erased cell: repaint whatever overlaps
+        # the erased area, in draw order, instead of just the changed segments
+        grid = self.sim.grid
+        if [rect for rect in vacated if grid.overlaps(rect.x, rect.y, bulk)] or \
+                [i for player, i in redraw if grid.count(*player.body[i]) > 1]:
+            self.redraw_under(dirty)
+        else:
+            for player, i in redraw:
+                player.draw_segment(i, player.get_tiles())
+        self.mark('players')
+
+        changed = []
+        for f, (x, y, pos) in zip(self.sim.food, food):
+            rect = pygame.Rect(x, y, bulk, bulk)
+            # unchanged bugs partly erased along with something else
+            if drawn.get(f) != states[f] or rect.collidelist(dirty) != -1:
+                changed.append((x, y, pos))
+                dirty.append(rect)
+        self.draw_food(changed)
+        self.mark('food')
+        self.drawn_food = states
+
+        status = self.get_status_surfaces()
+        if status is not self.drawn_status:
+            rect = pygame.Rect(0, self.gameheight, self.width, self.statusarea)
+            self.screen.blit(self.get_backdrop(), rect, rect)
+            self.draw_status_area()
+            self.drawn_status = status
+            dirty.append(rect)
+        self.mark('status')
+
+        if self.show_profile:
+            dirty.append(self.draw_profile())
+
+        pygame.display.update(dirty)
+        self.mark('flip')
+
+    def draw_profile(self):
+        # opaque box over the top left of the arena, refreshed a few
+        # times a second; returns the rect it covers
+        if self.profile_surface is None or self.profiler.frames % 15 == 0:
+            lines = [self.font.render(line, True, GREEN)
+                     for line in self.profiler.overlay_lines()]
+            width = max(line.get_width() for line in lines) + 10
+            height = sum(line.get_height() for line in lines) + 6
+            self.profile_surface = pygame.Surface((width, height))
+            textposy = 3
+            for line in lines:
+                self.profile_surface.blit(line, (5, textposy))
+                textposy += line.get_height()
+        return self.screen.blit(self.profile_surface, (1, 1))
+
+    def toggle_profile(self):
+        if self.profiler is None:
+            self.profiler = profiler.FrameProfiler()
+            self.sim.profiler = self.profiler
+        self.show_profile = not self.show_profile
+        self.profile_surface = None
+        self.full_redraw = True
+
+    def save_profile(self):
+        if self.profiler is not None and self.profile_file:
+            self.profiler.export(self.profile_file)
+
+    def redraw_under(self, rects):
+        for player in self.players:
+            if not player.playing:
+                continue
+            tiles = player.get_tiles()
+            for i, (x, y) in enumerate(player.body):
+                if pygame.Rect(x, y, self.bulk, self.bulk).collidelist(rects) != -1:
+                    player.draw_segment(i, tiles)
+
+    def draw_paused(self):
+        text = self.render_text('PAUSED - press p to resume', GREEN)
         textposx = (self.gamewidth / 2) - (text.get_size()[0] / 2)
         textposy = (self.gameheight / 4) - (text.get_size()[1] / 2)
         self.screen.blit(text, (textposx, textposy))
         pygame.display.update(textposx, textposy,
                               text.get_width(), text.get_height())
-        while paused:
-            self.clock.tick(self.framerate)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit(1)
-                    self.save_game_status()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_p:
-                        paused = False
-                    elif event.key == pygame.K_ESCAPE:
-                        self.running = False
-                        self.save_game_status()
-                        paused = False
-                        return self.run()
-        for player in self.players:
-            player.time = 0
-            
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                self.save_game_status()
-                sys.exit(1)
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    self.running = False
-                    self.save_game_status()
-                    return self.run()
-                elif event.key == pygame.K_p:
-                    self.pause()
-                for player in self.players:
-                    player.handle_key(event.key)
-
-    def startgame(self, pause=False):
-        self.running = True
-        while self.running:
-            self.handle_events()
-            #self.screen.fill(BLACK)
-            self.screen.blit(self.background, (0, 0))
-
-            self.draw_game_area()
-            self.draw_status_area()
-            self.draw_players()
-
-            self.clean_food()
-            self.draw_food()
-
-            pygame.display.flip()
-            self.clock.tick(self.framerate)
-            if pause:
-                self.pause()
-                pause = False
-        if not self.running:
-            self.save_scores()
-            self.play_again()
-            return self.run()
-
-    def play_again(self):
+
+    def render(self):
+        if self.dirty_rects and not self.full_redraw:
+            self.draw_dirty()
+        else:
+            self.draw_frame()
+
+    def draw_play_again(self):
         self.screen.fill(BLACK)
-        question = self.font.render('Play again? (y/n)', True, GREEN)
+        question = self.render_text('Play again? (y/n)', GREEN)
         self.screen.blit(question,
                          (self.width/2 - question.get_size()[0] / 2,
                           self.height/2 - question.get_size()[1] / 2)
                         )
+        textposy = self.height/2 + question.get_size()[1]
+        for player, rank in zip(self.players, self.ranks):
+            if rank is None:
+                text = '%s: %sp' % (player.name, player.score)
+            else:
+                text = '%s: %sp, rank %s' % (player.name, player.score, rank)
+            ranktext = self.render_text(text, player.color)
+            self.screen.blit(ranktext,
+                             (self.width/2 - ranktext.get_size()[0] / 2,
+                              textposy))
+            textposy += ranktext.get_size()[1] + 5
         pygame.display.flip()
-        asking = True
-        while asking:
-            self.clock.tick(self.framerate)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    asking = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_y:
-                        self.reset_game_env()
-                        self.startgame()
-                    else:
-                        asking = False
 
     def reset_game_env(self):
-        for player in self.players:
-            player.full_reset()
-        self.food = []
+        self.seed = random.getrandbits(32)
+        self.sim.reset(self.seed)
+        self.start_recording()
 
-    def score_page(self):
+    def draw_scores(self, board):
         self.screen.fill(BLACK)
 
-        scores = self.load_scores()
-        scoretext = []
+        difficulty, players = self.score_boards[board]
+        title = '%s, %s player%s (left/right for more)' % (
+            difficulty.capitalize(), players, 's' if players > 1 else '')
+        scoretext = [self.render_text(title, BLUE)]
         i = 1
-        for name, score in scores:
+        for name, score in self.load_scores(difficulty, players):
             s = '%s: %s - %s' % (i, name, score)
-            text = self.font.render(s, True, GREEN)
+            text = self.render_text(s, GREEN)
             scoretext.append(text)
             i += 1
 
@@ -582,97 +720,381 @@ class MainApp(object):
             textposy += score.get_size()[1] + 5
 
         pygame.display.flip()
-        showing_scores = True
-        while showing_scores:
-            self.clock.tick(self.framerate)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    showing_scores = False
-                    sys.exit(1)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        showing_scores = False
-                        return self.run()
-
-    def load_scores(self):
-        if os.path.isfile(SCORE_FILE_NAME):
-            scores = pickle.load(open(SCORE_FILE_NAME, 'rb'))
-        else:
-            scores = []
-            for i in range(0, 10):
-                scores.append(('NOBODY', 0))
-        return sorted(scores, cmp=lambda x, y: y[1] - x[1])
+
+    def get_score_store(self):
+        if self.score_store is None:
+            self.score_store = scores.ScoreStore(SCORE_DB_NAME)
+            # the old list did not know about modes
+            self.score_store.import_legacy(SCORE_FILE_NAME, engine.NORMAL, 1)
+        return self.score_store
+
+    def load_scores(self, difficulty, players, count=10):
+        top = self.get_score_store().top(count, difficulty, players)
+        while len(top) < count:
+            top.append(('NOBODY', 0))
+        return top
 
     def save_scores(self):
-        scores = self.load_scores()
+        store = self.get_score_store()
+        # a game against the computer goes on the board of its human seats
+        humans = len([player for player in self.players
+                      if player.controller is None])
+        self.ranks = []
         for player in self.players:
-            for i in range(0, len(scores)):
-                if scores[i][1] >= player.score:
-                    continue
-                else:
-                    scores.insert(i, (player.name, player.score))
-                    scores.pop()
-                    break
-        pickle.dump(scores, open(SCORE_FILE_NAME, 'wb'))
-
-    def player_names_screen(self):
-        for i in range(0, len(self.players)):
-            player = self.players[i]
-            name = player.name
-            entering_name = True
-            while entering_name:
-                self.clock.tick(self.framerate)
-                self.screen.fill(BLACK)
-                text = 'Player %s name:    %s_' % (i + 1, name)
-                nametext = self.font.render(text, True, player.color)
-                self.screen.blit(nametext, (self.gamewidth / 4, self.gameheight / 4))
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        sys.exit(1)
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_RETURN:
-                            entering_name = False
-                        elif event.key == pygame.K_BACKSPACE:
-                            name = name[:-1]
-                            name = name.capitalize()
-                        elif event.key == pygame.K_ESCAPE:
-                            return self.run()
-                        else:
-                            try:
-                                name = name + chr(event.key)
-                                name = name.capitalize()
-                            except:
-                                pass
-                pygame.display.flip()
-            player.name = name
-
-    def select_difficulty_screen(self):
-        selecting = True
-        while selecting:
-            self.clock.tick(self.framerate)
-            self.screen.fill(BLACK)
-            text = 'Press 1 for normal difficulty or 2 for hard difficulty'
-            nametext = self.font.render(text, True, GREEN)
-            self.screen.blit(nametext, (self.gamewidth / 4, self.gameheight / 4))
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit(1)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_1:
-                        self.difficulty = 'normal'
-                        selecting = False
-                    elif event.key == pygame.K_2:
-                        self.difficulty = 'hard'
-                        selecting = False
-                    elif event.key == pygame.K_ESCAPE:
-                        return self.run()
-            pygame.display.flip()
-        if self.difficulty == 'hard':
-            for player in self.players:
-                player.speed = 50
+            if player.controller is not None:
+                # computer players stay off the leaderboards
+                self.ranks.append(None)
+                continue
+            self.ranks.append(store.add(player.name, player.score,
+                                        self.sim.difficulty, humans))
 
-game = MainApp()
-game.run()
+    def draw_player_name(self, i, name):
+        player = self.players[i]
+        self.screen.fill(BLACK)
+        text = 'Player %s name:    %s_' % (i + 1, name)
+        nametext = self.render_text(text, player.color)
+        self.screen.blit(nametext, (self.gamewidth / 4, self.gameheight / 4))
+        pygame.display.flip()
+
+    def draw_difficulty(self):
+        self.screen.fill(BLACK)
+        text = 'Press 1 for normal difficulty or 2 for hard difficulty'
+        nametext = self.render_text(text, GREEN)
+        self.screen.blit(nametext, (self.gamewidth / 4, self.gameheight / 4))
+        pygame.display.flip()
+
+
+class Scene(object):
+    """One screen of the game. MainApp.run calls frame() once per frame
+    with that frame's events; scenes move on with app.switch()."""
+
+    def __init__(self, app):
+        self.app = app
+        self.elapsed = 0 # ms
+
+    def enter(self):
+        pass
+
+    def handle_events(self, events):
+        """False once an event made the app leave this scene."""
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.close()
+            elif event.type == pygame.KEYDOWN:
+                self.handle_key(event.key)
+            if self.app.scene is not self:
+                return False
+        return True
+
+    def handle_key(self, key):
+        pass
+
+    def close(self):
+        self.app.quit()
+
+    def draw(self):
+        pass
+
+    def frame(self, events):
+        if self.handle_events(events):
+            self.draw()
+            self.elapsed += self.app.clock.tick(self.app.framerate)
+
+
+class Menu(Scene):
+    def enter(self):
+        app = self.app
+        app.players = []
+        p1_controls = pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT
+        p2_controls = pygame.K_w, pygame.K_s, pygame.K_a, pygame.K_d
+        pos1, pos2 = app.start_positions()
+        self.player1 = Player('Player 1', p1_controls, 1, app.screen,
+                              pos1, WHITE, 10)
+        self.player2 = Player('Player 2', p2_controls, 2, app.screen,
+                              pos2, RED, 10)
+        self.computer = AutoPlayer('Computer', 2, app.screen, pos2, RED, 10)
+        app.draw_menu()
+
+    def handle_key(self, key):
+        app = self.app
+        # any key counts as activity, even one that stays in the menu
+        self.elapsed = 0
+        if key == pygame.K_1:
+            app.add_player(self.player1)
+            app.switch(PlayerNames(app))
+        elif key == pygame.K_2:
+            app.add_player(self.player1)
+            app.add_player(self.player2)
+            app.switch(PlayerNames(app))
+        elif key == pygame.K_3:
+            app.add_player(self.player1)
+            app.add_player(self.computer)
+            app.switch(PlayerNames(app))
+        elif key == pygame.K_c and app.game_status_is_saved():
+            app.load_game_status()
+            app.switch(Game(app, pause=True))
+        elif key == pygame.K_F1:
+            app.switch(Scores(app))
+        elif key == pygame.K_ESCAPE:
+            app.quit()
+
+    def frame(self, events):
+        Scene.frame(self, events)
+        app = self.app
+        if app.scene is self and app.attract_delay and \
+                self.elapsed >= app.attract_delay:
+            app.new_demo()
+
+
+class PlayerNames(Scene):
+    def enter(self):
+        # computer players keep their names
+        self.humans = [i for i, player in enumerate(self.app.players)
+                       if player.controller is None]
+        self.index = self.humans.pop(0)
+        self.name = self.app.players[self.index].name
+
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_RETURN:
+            app.players[self.index].name = self.name
+            if self.humans:
+                self.index = self.humans.pop(0)
+                self.name = app.players[self.index].name
+            else:
+                app.switch(Difficulty(app))
+        elif key == pygame.K_BACKSPACE:
+            self.name = self.name[:-1].capitalize()
+        elif key == pygame.K_ESCAPE:
+            app.switch(Menu(app))
+        else:
+            try:
+                self.name = (self.name + chr(key)).capitalize()
+            except:
+                pass
+
+    def draw(self):
+        self.app.draw_player_name(self.index, self.name)
+
+
+class Difficulty(Scene):
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_1:
+            app.difficulty = engine.NORMAL
+            app.new_game()
+        elif key == pygame.K_2:
+            app.difficulty = engine.HARD
+            app.new_game()
+        elif key == pygame.K_ESCAPE:
+            app.switch(Menu(app))
+
+    def draw(self):
+        self.app.draw_difficulty()
+
+
+class Game(Scene):
+    """Steps the simulation at its fixed tick whatever the frame rate,
+    drawing the snakes part way to their next cell in between."""
+
+    def __init__(self, app, pause=False):
+        Scene.__init__(self, app)
+        self.pause = pause
+        app.lag = 0
+
+    def enter(self):
+        app = self.app
+        app.running = True
+        app.full_redraw = True
+        app.sim.profiler = app.profiler
+
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_ESCAPE:
+            app.leave_game()
+            app.switch(Menu(app))
+        elif key == pygame.K_p:
+            app.switch(Paused(app, self))
+        elif key == pygame.K_F3:
+            app.toggle_profile()
+        for player in app.players:
+            player.handle_key(key)
+
+    def playing(self):
+        """True until every human player is out of lives; a computer
+        opponent does not keep the game going on its own."""
+        for player in self.app.players:
+            if player.controller is None and player.playing:
+                return True
+        return False
+
+    def close(self):
+        self.app.leave_game()
+        self.app.quit()
+
+    def autosave(self):
+        self.app.autosave()
+        self.app.mark('autosave')
+
+    def over(self):
+        self.app.game_over()
+
+    def frame(self, events):
+        app = self.app
+        if app.profiler is not None:
+            app.profiler.begin_frame()
+        if not self.handle_events(events):
+            return
+        app.mark('events')
+        sim = app.sim
+        app.lag += app.clock.tick(app.framerate)
+        app.mark('tick')
+        # computer players plan within one budget for all of this frame's ticks
+        autopilot.BUDGET.begin_frame()
+        steps = 0
+        while app.lag >= sim.tick and self.playing():
+            if steps == app.max_catch_up:
+                # too far behind, let the game slow down instead
+                app.lag = 0
+                break
+            sim.step(app.computer_turns())
+            app.lag -= sim.tick
+            steps += 1
+        playing = self.playing()
+        if playing:
+            self.autosave()
+        app.render()
+        if app.profiler is not None:
+            app.profiler.end_frame()
+        if not playing:
+            self.over()
+        elif self.pause:
+            # a continued game starts paused, after one frame to look at
+            self.pause = False
+            app.switch(Paused(app, self))
+
+
+class Demo(Game):
+    """Computer players only, shown from the menu when nobody is
+    playing; any key goes back. Nothing is saved."""
+
+    def handle_key(self, key):
+        self.app.switch(Menu(self.app))
+
+    def playing(self):
+        return self.app.sim.running
+
+    def close(self):
+        self.app.quit()
+
+    def autosave(self):
+        pass
+
+    def over(self):
+        self.app.switch(Menu(self.app))
+
+
+class Paused(Scene):
+    def __init__(self, app, game):
+        Scene.__init__(self, app)
+        self.game = game
+
+    def enter(self):
+        self.app.draw_paused()
+
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_p:
+            app.switch(self.game)
+        elif key == pygame.K_ESCAPE:
+            app.leave_game()
+            app.switch(Menu(app))
+
+    def close(self):
+        self.app.leave_game()
+        self.app.quit()
+
+
+class PlayAgain(Scene):
+    def enter(self):
+        self.app.draw_play_again()
+
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_y:
+            app.reset_game_env()
+            app.switch(Game(app))
+        else:
+            app.switch(Menu(app))
+
+
+class Scores(Scene):
+    def enter(self):
+        self.board = 0
+        self.app.draw_scores(self.board)
+
+    def handle_key(self, key):
+        app = self.app
+        if key == pygame.K_ESCAPE:
+            app.switch(Menu(app))
+        elif key in (pygame.K_LEFT, pygame.K_RIGHT):
+            step = 1 if key == pygame.K_RIGHT else -1
+            self.board = (self.board + step) % len(app.score_boards)
+            app.draw_scores(self.board)
+
+
+class Playback(Scene):
+    def __init__(self, app, recorded):
+        Scene.__init__(self, app)
+        self.steps = iter(recorded)
+
+    def enter(self):
+        self.app.full_redraw = True
+
+    def handle_key(self, key):
+        if key == pygame.K_ESCAPE:
+            self.app.switch(Menu(self.app))
+
+    def frame(self, events):
+        app = self.app
+        if not self.handle_events(events):
+            return
+        step = next(self.steps, None)
+        if step is None:
+            app.switch(Menu(app))
+            return
+        dt, actions = step
+        app.render()
+        # wait out the recorded frame time to play at real speed
+        if dt:
+            app.clock.tick(1000.0 / dt)
+        app.sim.step(actions, dt)
+
+
+def main(argv):
+    started = time.perf_counter()
+    game = MainApp()
+    game.dirty_rects = '--dirty-rects' in argv
+    game.record_replays = '--record' in argv
+    if '--autosave' in argv:
+        game.autosave_interval = float(argv[argv.index('--autosave') + 1])
+    if '--fps' in argv:
+        game.framerate = int(argv[argv.index('--fps') + 1])
+    if '--profile' in argv:
+        game.profiler = profiler.FrameProfiler()
+        game.profile_file = PROFILE_FILE_NAME
+    if '--startup-time' in argv:
+        game.draw_menu()
+        print('first menu frame after %.1f ms' %
+              ((time.perf_counter() - started) * 1000))
+    elif '--replay' in argv:
+        game.play_replay(argv[argv.index('--replay') + 1])
+    else:
+        game.run()
+
+
+if __name__ == '__main__':
+    main(sys.argv)
 
 #todo:
 # two player co-op mode with shared score
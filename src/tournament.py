@@ -0,0 +1,161 @@
+"""Round-robin tournaments between automated controllers.
+
+A controller takes the place of the keyboard: it is called as
+controller(sim, snake) once per tick and returns a direction
+(engine.UP/DOWN/LEFT/RIGHT) or None to keep going, which then goes
+through the same Snake.turn reversal rules as Player.handle_key.
+Matches run headless on engine.Simulation across a process pool, so
+controllers must be picklable (module level functions or classes).
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+import autopilot
+
+
+WIDTH = 800
+HEIGHT = 575
+
+
+def start_positions(width=WIDTH, height=HEIGHT):
+    # same spots as player 1 and 2 in snakegame.MainApp.run
+    return [(width // 2, height // 2), (width // 3, height // 3)]
+
+
+def play_match(controllers, seed, difficulty=engine.NORMAL, max_ticks=20000,
+               width=WIDTH, height=HEIGHT):
+    """Play one game with a snake per controller, return their scores.
+
+    The game ends when every snake is out of lives or after max_ticks
+    fixed ticks, whichever comes first.
+    """
+    sim = engine.Simulation(width, height, difficulty=difficulty, seed=seed)
+    positions = start_positions(width, height)
+    for number, controller in enumerate(controllers):
+        sim.add_snake(engine.Snake(number + 1, positions[number]))
+    sim.set_difficulty(difficulty)
+    for tick in range(max_ticks):
+        actions = []
+        for controller, snake in zip(controllers, sim.snakes):
+            if snake.playing:
+                actions.append(controller(sim, snake))
+            else:
+                actions.append(None)
+        sim.step(actions)
+        if not sim.running:
+            break
+    return [snake.score for snake in sim.snakes]
+
+
+def _play(job):
+    names, controllers, seed, options = job
+    return names, play_match(controllers, seed, **options)
+
+
+def schedule(names, games=10, players=(1, 2), seed=0):
+    """Matches for a round robin: every controller alone and every pair
+    of controllers, each played games times, in both seat orders."""
+    matches = []
+    for count in players:
+        if count == 1:
+            lineups = [(name,) for name in names]
+        else:
+            lineups = [(a, b) for a in names for b in names if a != b]
+        for lineup in lineups:
+            for game in range(games):
+                matches.append((lineup, seed))
+                seed += 1
+    return matches
+
+
+def round_robin(controllers, games=10, players=(1, 2), workers=None,
+                seed=0, **options):
+    """Run a tournament between controllers, a dict of name -> callable.
+
+    Returns name -> {'games', 'score', 'wins'} where a win is the
+    highest score in a 2-player match. workers is passed on to
+    ProcessPoolExecutor; 0 plays everything in this process.
+    """
+    jobs = []
+    for lineup, match_seed in schedule(sorted(controllers), games, players,
+                                       seed):
+        jobs.append((lineup, [controllers[name] for name in lineup],
+                     match_seed, options))
+
+    if workers == 0:
+        results = map(_play, jobs)
+    else:
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(workers)
+        chunksize = max(1, len(jobs) // (4 * workers))
+        results = pool.map(_play, jobs, chunksize=chunksize)
+
+    table = dict((name, {'games': 0, 'score': 0, 'wins': 0})
+                 for name in controllers)
+    try:
+        for lineup, scores in results:
+            for name, score in zip(lineup, scores):
+                table[name]['games'] += 1
+                table[name]['score'] += score
+            if len(lineup) > 1 and scores.count(max(scores)) == 1:
+                table[lineup[scores.index(max(scores))]]['wins'] += 1
+    finally:
+        if workers != 0:
+            pool.shutdown()
+    return table
+
+
+def random_controller(sim, snake):
+    if sim.random.random() < 0.1:
+        return sim.random.choice(list(engine.DIRECTIONS))
+    return None
+
+
+def greedy_controller(sim, snake):
+    """Head for the closest food, dodging walls and bodies one cell ahead."""
+    if not sim.food:
+        return None
+    food = min(sim.food, key=lambda f: abs(f.x - snake.x) + abs(f.y - snake.y))
+    wanted = []
+    if food.x > snake.x + snake.bulk // 2:
+        wanted.append(engine.RIGHT)
+    elif food.x < snake.x - snake.bulk // 2:
+        wanted.append(engine.LEFT)
+    if food.y > snake.y + snake.bulk // 2:
+        wanted.append(engine.DOWN)
+    elif food.y < snake.y - snake.bulk // 2:
+        wanted.append(engine.UP)
+    wanted.extend(d for d in engine.DIRECTIONS if d not in wanted)
+    for direction in wanted:
+        dx, dy = engine.DIRECTIONS[direction]
+        dx *= snake.bulk
+        dy *= snake.bulk
+        if (dx and dx == -snake.dir_x) or (dy and dy == -snake.dir_y):
+            continue
+        x, y = snake.x + dx, snake.y + dy
+        if sim.contains(x, y, snake.bulk) and not sim.grid.count(x, y):
+            return direction
+    return None
+
+
+CONTROLLERS = {
+    'random': random_controller,
+    'greedy': greedy_controller,
+    'autopilot': autopilot.Autopilot(),
+}
+
+
+def main(argv):
+    games = int(argv[1]) if len(argv) > 1 else 10
+    table = round_robin(CONTROLLERS, games=games)
+    ranked = sorted(table.items(), key=lambda item: -item[1]['score'])
+    for name, row in ranked:
+        print('%-10s games: %4d  wins: %4d  score: %8d  avg: %8.1f' % (
+            name, row['games'], row['wins'], row['score'],
+            float(row['score']) / max(row['games'], 1)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)